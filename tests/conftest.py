@@ -0,0 +1,54 @@
+import datetime as dt
+import itertools
+import random
+
+import pandas as pd
+import pytest
+
+from tracker import db, fetch_df
+
+_USERS = itertools.count(1)
+
+# the day the tests treat as today; fixed so seeded histories give the same logs on every run
+TODAY = dt.date(2025, 6, 15)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def tracker_home(tmp_path_factory):
+    """One database directory for the run; every test gets a user (and so a database file) of its own."""
+    home = tmp_path_factory.mktemp("tracker")
+    db.configure(home / "tracker.db")
+    yield home
+    db.DB.close_all()
+
+
+@pytest.fixture(autouse=True)
+def user():
+    name = f"test-{next(_USERS)}"
+    with db.as_user(name):
+        yield name
+
+
+@pytest.fixture
+def today():
+    return TODAY
+
+
+@pytest.fixture
+def history():
+    """Factory for a seeded random import frame of `n` logs over the `days` days up to `end`.
+
+    Logs go to the first `tasks` unlocked tasks, or to every task (locked ones too) with locked=True.
+    """
+    def make(n=600, seed=7, days=700, end=TODAY, tasks=6, locked=False, notes=False):
+        rng = random.Random(seed)
+        pool = fetch_df(f"SELECT domain, task FROM tasks {'' if locked else 'WHERE locked=0'} ORDER BY id")
+        pool = pool.values.tolist()[:tasks]
+        rows = []
+        for d, t in (rng.choice(pool) for _ in range(n)):
+            rows.append({"date": (end - dt.timedelta(days=rng.randint(0, days))).isoformat(), "domain": d, "task": t,
+                         "minutes": rng.choice([5, 10, 20, 45, 90])})
+            if notes:
+                rows[-1]["note"] = rng.choice(["", 'héllo, "q"', "x"])
+        return pd.DataFrame(rows)
+    return make
@@ -0,0 +1,107 @@
+import csv
+import datetime as dt
+import io
+
+from tracker import (archive_logs, as_user, assistant_handle, export_logs, fetch_rows, history_page,
+                     import_logs, log_progress, read_log_file, recompute_state, state_as_of, xp_by_day)
+from tracker.archive import segments
+
+AS_OF = dt.date(2025, 6, 1)
+# logs from 2023-01-01 to 2025-04-30 over every task, notes included
+HISTORY = dict(seed=11, days=850, end=dt.date(2025, 4, 30), tasks=None, locked=True, notes=True)
+
+
+def _archive():
+    return archive_logs(horizon_days=365, today=AS_OF)
+
+
+def _pages(**filters):
+    pages, before = [], None
+    while True:
+        page, before = history_page(before_id=before, page_size=97, **filters)
+        pages.append(page.drop(columns="ts").values.tolist())
+        if before is None:
+            return pages
+
+
+def _exported():
+    rows = list(csv.reader(io.StringIO("".join(export_logs("csv", 500)))))[1:]
+    return sorted(r[:1] + r[2:] for r in rows)
+
+
+def _views():
+    """Everything callers read from logs, hot or cold (bar the `ts` of logs written during the test)."""
+    return {
+        "tasks": fetch_rows("SELECT id, xp, streak, last_done, locked FROM tasks ORDER BY id"),
+        "rollup": [r[:6] + (round(r[6], 6),) for r in fetch_rows("SELECT * FROM daily_rollup ORDER BY date, task_id")],
+        "learn_window": fetch_rows("SELECT * FROM learn_window ORDER BY task_id"),
+        "checkpoints": fetch_rows("SELECT * FROM xp_checkpoints ORDER BY date, task_id"),
+        "as_of": [state_as_of(day).values.tolist() for day in ("2023-02-10", "2023-06-30", "2024-05-05", "2025-12-31")],
+        "history": [_pages(**f) for f in ({}, {"domain": "business"}, {"task": "SQL"},
+                                          {"date_from": "2023-03-01", "date_to": "2023-05-01"})],
+        "xp_by_day": xp_by_day(None).values.tolist(),
+        "export": _exported(),
+    }
+
+
+def _hot_and_cold(user, df, then=None):
+    """(views of a database that kept `df` hot, views of one that archived it), after `then()` on both."""
+    out = []
+    for name, cold in ((f"{user}-hot", False), (user, True)):
+        with as_user(name):
+            import_logs(df)
+            if cold:
+                assert _archive()["rows"] > 0
+            if then:
+                then()
+            out.append(_views())
+    return out
+
+
+def test_archived_logs_read_like_hot_ones(user, history):
+    df = history(3000, **HISTORY)
+    hot, cold = _hot_and_cold(user, df)
+    assert cold == hot
+    assert fetch_rows("SELECT COUNT(*) FROM logs")[0][0] + sum(s[2] for s in segments()) == len(df)
+
+
+def test_backdated_log_into_an_archived_month_and_recompute(user, history):
+    def then():
+        log_progress("Business", "Execution", 33, day="2023-03-15")
+        _archive()
+        assert recompute_state()["gains_changed"] == 0
+
+    hot, cold = _hot_and_cold(user, history(3000, **HISTORY), then)
+    assert cold == hot
+
+
+def test_reset_task_drops_its_archived_logs(user, history):
+    hot, cold = _hot_and_cold(user, history(3000, **HISTORY), lambda: assistant_handle("reset task Execution"))
+    assert cold == hot
+    assert not any(row[3] == "Execution" for row in cold["export"])
+
+
+def test_rearchiving_after_reset_all_never_serves_deleted_rows(history):
+    import_logs(history(500, **HISTORY))
+    _archive()
+    assert len(_pages(date_to="2024-12-31")[0]) == 97   # month files read (and cached) before the reset
+    assistant_handle("reset all")
+    for day in ("2023-02-03", "2023-02-04", "2024-01-10"):
+        log_progress("Coding", "SQL", 25, "after reset", day=day)
+    _archive()
+    assert [(s[0], s[2]) for s in segments()] == [("2023-02", 2), ("2024-01", 1)]
+    assert [row[-1] for page in _pages() for row in page] == ["after reset"] * 3
+    assert [row[-1] for row in _exported()] == ["after reset"] * 3
+
+
+def test_export_round_trips_through_import(user, history):
+    import_logs(history(1500, **HISTORY))
+    _archive()
+    log_progress("Coding", "SQL", 40, "today")
+    exported = "".join(export_logs("jsonl", 256))
+    tasks = fetch_rows("SELECT id, xp, streak, last_done FROM tasks ORDER BY id")
+    logs = _exported()
+    with as_user(f"{user}-copy"):
+        import_logs(read_log_file(io.StringIO(exported), "logs.jsonl"))
+        assert fetch_rows("SELECT id, xp, streak, last_done FROM tasks ORDER BY id") == tasks
+        assert sorted(r[1:] for r in _exported()) == sorted(r[1:] for r in logs)   # ids are renumbered
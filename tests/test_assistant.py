@@ -0,0 +1,84 @@
+import argparse
+import json
+
+import pytest
+
+from tracker import (CommandError, assistant_handle, assistant_run_script, cli, fetch_rows, parse_command,
+                     run_command)
+from tracker.assistant import Command
+
+
+def _counts():
+    return fetch_rows("SELECT (SELECT COUNT(*) FROM logs), (SELECT COUNT(*) FROM tasks)")[0]
+
+
+@pytest.mark.parametrize("text, command", [
+    ('log 45 minutes Python on 2024-05-01 "ETL practice"',
+     Command("log", {"minutes": 45, "task": "Python", "note": "etl practice", "day": "2024-05-01"})),
+    ("  LOG 30 min power bi ", Command("log", {"minutes": 30, "task": "Power Bi", "note": "", "day": None})),
+    ("set goal sql 60", Command("set_goal", {"task": "Sql", "value": 60})),
+    ('add task "Meditation" under "Body Discipline"',
+     Command("add_task", {"task": "Meditation", "domain": "Body Discipline"})),
+    ('rename task "Diet Logging" to "Nutrition Log"', Command("rename", {"old": "Diet Logging", "new": "Nutrition Log"})),
+    ("unlock task highway", Command("lock", {"action": "unlock", "task": "Highway"})),
+    ("reset all", Command("reset_all", {})),
+])
+def test_parse_command(text, command):
+    assert parse_command(text) == command
+
+
+@pytest.mark.parametrize("text", ["log ten min sql", "log -5 min sql", "log 30 min sql on 2024-5-1", "reset all now",
+                                  "make coffee"])
+def test_unparseable_commands(text):
+    assert parse_command(text) is None
+
+
+def test_invalid_log_date_is_a_command_error():
+    with pytest.raises(CommandError, match="Invalid date 2024-02-30"):
+        run_command(parse_command("log 30 min sql on 2024-02-30"))
+    assert _counts()[0] == 0
+
+
+def test_adding_an_existing_task_is_a_command_error():
+    before = _counts()
+    assert assistant_handle('add task "SQL" under "Coding"') == "Task 'Sql' already exists under 'Coding'."
+    assert _counts() == before
+
+
+def test_a_script_with_invalid_lines_applies_nothing():
+    before = _counts()
+    results = assistant_run_script("log 30 min sql\n# comment\n\nlog 20 min sql on 2024-02-30\nlog 20 min python\n")
+    assert [(r.line, r.ok, r.message) for r in results] == [
+        (1, False, "Valid; not run because other lines have errors."),
+        (4, False, "Invalid date 2024-02-30."),
+        (5, False, "Task 'Python' is locked."),
+    ]
+    assert [r.message for r in assistant_run_script("log 30 min sql\nlog ten min sql")] == [
+        "Valid; not run because other lines have errors.", "Sorry, I couldn't parse that."]
+    assert _counts() == before
+
+
+def test_a_failing_line_rolls_back_the_whole_script():
+    before = _counts()
+    results = assistant_run_script('log 30 min sql\nadd task "Meditation" under "Body Discipline"\n'
+                                   'add task "Meditation" under "Body Discipline"\nlog 20 min sql')
+    assert [(r.ok, r.message) for r in results] == [
+        (False, "Rolled back."), (False, "Rolled back."),
+        (False, "Task 'Meditation' already exists under 'Body Discipline'."), (False, "Not run."),
+    ]
+    assert _counts() == before
+    assert fetch_rows("SELECT COUNT(*) FROM tasks WHERE task = 'Meditation'") == [(0,)]
+
+
+def test_a_valid_script_runs_in_order():
+    results = assistant_run_script('add task "Meditation" under "Body Discipline"\nlog 10 min meditation\n'
+                                   'log 15 min meditation on 2024-05-01')
+    assert [r.ok for r in results] == [True, True, True]
+    assert [r[1:] for r in fetch_rows("SELECT id, minutes, date = '2024-05-01' FROM logs ORDER BY id")] == [(10, 0), (15, 1)]
+
+
+def test_cli_batch_reads_the_script_file(tmp_path, capsys):
+    script = tmp_path / "week.txt"
+    script.write_text("# week 18\nlog 30 min sql on 2024-05-01\n", encoding="utf-8")
+    assert cli.cmd_batch(argparse.Namespace(file=str(script), json=True)) == 0
+    assert json.loads(capsys.readouterr().out) == [{"line": 2, "ok": "ok", "message": "Logged 30 min to Sql on 2024-05-01."}]
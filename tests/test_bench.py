@@ -0,0 +1,42 @@
+import datetime as dt
+import json
+
+from tracker import as_user, bench, fetch_rows
+
+
+def test_generate_is_determined_by_seed_and_end(user):
+    end = dt.date(2024, 2, 29)
+    logs = bench.generate(500, n_domains=7, tasks_per_domain=3, years=1, seed=5, end=end)
+    assert fetch_rows("SELECT COUNT(*) FROM tasks WHERE domain LIKE 'Synth %'") == [(6,)]
+    assert logs["date"].min() >= (end - dt.timedelta(days=365)).isoformat()
+    assert logs["date"].max() < end.isoformat()
+    with as_user(f"{user}-again"):
+        assert bench.generate(500, n_domains=7, tasks_per_domain=3, years=1, seed=5, end=end).equals(logs)
+
+
+def _report(end, median_ms):
+    return {"meta": {"end": end}, "results": [{"size": 10, "op": "log_progress", "median_ms": median_ms}]}
+
+
+def test_compare_flags_ops_slower_than_the_threshold():
+    current = _report("2024-01-01", 2.0)
+    assert bench.compare(current, _report("2024-01-01", 1.7)) == []
+    assert bench.compare(current, _report("2024-01-01", 1.0)) == [
+        {"size": 10, "op": "log_progress", "baseline_ms": 1.0, "median_ms": 2.0, "ratio": 2.0}]
+
+
+def test_compare_reruns_on_the_baselines_end_date(tmp_path, monkeypatch):
+    ends = []
+
+    def run(sizes, n_domains, tasks_per_domain, years, repeat, seed, end):
+        ends.append(end)
+        return _report(str(end), 3.0)
+
+    monkeypatch.setattr(bench, "run", run)
+    baseline = tmp_path / "base.json"
+    baseline.write_text(json.dumps(_report("2024-03-10", 1.0)), encoding="utf-8")
+    out = str(tmp_path / "out.json")
+    assert bench.main(["--sizes", "10", "--compare", str(baseline), "--out", out]) == 1
+    assert bench.main(["--sizes", "10", "--compare", str(baseline), "--out", out, "--end", "2024-01-05"]) == 1
+    assert bench.main(["--sizes", "10", "--out", out]) == 0
+    assert ends == [dt.date(2024, 3, 10), dt.date(2024, 1, 5), None]
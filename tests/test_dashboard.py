@@ -0,0 +1,81 @@
+import datetime as dt
+import json
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+import tracker
+from tracker import fetch_rows, import_logs, log_progress, trend
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+
+
+def _recent(history, n, days):
+    # trend windows are relative to the clock, so these logs are too
+    return history(n, days=days, end=dt.date.today(), tasks=None)
+
+
+@pytest.mark.parametrize("days, points, bucket", [(30, 200, "day"), (365, 60, "week"), (None, 50, "month"),
+                                                  (None, 3, "year")])
+def test_trend_buckets_days_to_fit_the_point_budget(history, days, points, bucket):
+    import_logs(_recent(history, 600, 1000))
+    df, name = trend("minutes", days, points)
+    assert name == bucket
+    assert df.groupby("domain").size().max() <= points
+    since = "" if days is None else (dt.date.today() - dt.timedelta(days=days)).isoformat()
+    assert df["minutes"].sum() == fetch_rows("SELECT SUM(minutes) FROM logs WHERE date >= ?", (since,))[0][0]
+
+
+def test_trend_rejects_unknown_metrics():
+    with pytest.raises(ValueError, match="Unknown trend metric"):
+        trend("ratio")
+
+
+def _charts(at):
+    return [json.loads(c.proto.spec) for c in at.get("plotly_chart")]
+
+
+def _tomorrow():
+    """A stand-in `datetime` module whose date.today() is tomorrow, for the app script only."""
+    class Date(dt.date):
+        @classmethod
+        def today(cls):
+            return dt.date.today() + dt.timedelta(days=1)
+
+    fake = types.ModuleType("datetime")
+    fake.__dict__.update(vars(dt))
+    fake.date = Date
+    return fake
+
+
+def test_dashboard_figures_are_cached_until_a_write_or_a_new_day(user, history, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+    import_logs(_recent(history, 300, 400))
+    builds = []
+
+    def counted(*args, **kwargs):
+        builds.append(args)
+        return trend(*args, **kwargs)
+
+    monkeypatch.setattr(tracker, "trend", counted)
+    at = AppTest.from_file(str(MAIN), default_timeout=60)
+    at.run()
+    at.sidebar.text_input[0].set_value(user).run()
+    assert not at.exception
+    gauges, chart = _charts(at)
+    assert len(gauges["data"]) == len(fetch_rows("SELECT DISTINCT domain FROM tasks"))
+    assert {t["type"] for t in gauges["data"]} == {"indicator"}
+    n = len(builds)
+    at.run()
+    assert len(builds) == n and _charts(at) == [gauges, chart]
+    log_progress("Coding", "SQL", 30)
+    at.run()
+    assert len(builds) == n + 1
+    # only main.py is re-imported per rerun; the engine and pandas keep the real module
+    monkeypatch.setitem(sys.modules, "datetime", _tomorrow())
+    at.run()
+    monkeypatch.setitem(sys.modules, "datetime", dt)
+    assert not at.exception
+    assert len(builds) == n + 2
@@ -0,0 +1,82 @@
+import threading
+
+from tracker import db
+
+
+def test_eviction_skips_connections_inside_a_transaction(user):
+    pool = db.ConnectionManager(max_conns=2)
+    busy = pool.get()
+    busy.execute("BEGIN IMMEDIATE")
+    busy.execute("INSERT INTO meta(key, value) VALUES('test:busy', 1)")
+    for i in range(3):
+        with db.as_user(f"{user}-{i}"):
+            pool.get()
+    assert busy in pool._conns.values()
+    busy.commit()
+    assert db.fetch_rows("SELECT value FROM meta WHERE key='test:busy'") == [(1.0,)]
+    pool.close_all()
+
+
+def test_evicted_connections_stay_usable(user):
+    pool = db.ConnectionManager(max_conns=1)
+    first = pool.get()
+    with db.as_user(f"{user}-other"):
+        pool.get()
+    assert first not in pool._conns.values()
+    assert first.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] > 0
+    pool.close_all()
+    first.close()
+
+
+def _goal(cache):
+    return cache.get_df("SELECT goal_min FROM tasks WHERE task = 'SQL'")["goal_min"][0]
+
+
+def test_cache_serves_reads_until_a_write(user):
+    cache = db.QueryCache()
+    assert _goal(cache) == _goal(cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    db.execute("UPDATE tasks SET goal_min = 99 WHERE task = 'SQL'")
+    assert _goal(cache) == 99
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_sees_writes_from_other_connections(user):
+    cache = db.QueryCache()
+    _goal(cache)
+
+    def write():
+        with db.as_user(user):
+            db.execute("UPDATE tasks SET goal_min = 77 WHERE task = 'SQL'")
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    thread.join()
+    assert _goal(cache) == 77
+
+
+def test_cache_is_bypassed_inside_a_transaction(user):
+    cache = db.QueryCache()
+    _goal(cache)
+    with db.transaction():
+        db.execute("UPDATE tasks SET goal_min = 55 WHERE task = 'SQL'")
+        assert _goal(cache) == 55
+    assert cache.misses == 1
+
+
+def test_cache_evicts_least_recently_used_entries(user):
+    cache = db.QueryCache(max_entries=2)
+    queries = [f"SELECT {i} AS n" for i in range(3)]
+    for q in queries[:2] + queries[:1] + queries[2:]:
+        cache.get_rows(q)
+    assert cache.stats()["entries"] == 2 and cache.evictions == 1
+    cache.get_rows(queries[0])
+    cache.get_rows(queries[1])
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_cached_frames_are_private_copies(user):
+    cache = db.QueryCache()
+    df = cache.get_df("SELECT task, xp FROM tasks")
+    df["xp"] = -1
+    assert (cache.get_df("SELECT task, xp FROM tasks")["xp"] >= 0).all()
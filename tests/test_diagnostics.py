@@ -0,0 +1,20 @@
+from tracker.diagnostics import Profiler
+
+
+def test_reset_mid_rerun_unhooks_the_connections():
+    p = Profiler()
+    p.begin_rerun("page", enabled=True)
+    assert p.hooked
+    p.reset()
+    p.end_rerun()
+    assert not p.hooked
+    assert list(p.reruns) == []
+
+
+def test_begin_rerun_closes_the_unfinished_one():
+    p = Profiler()
+    p.begin_rerun("first", enabled=True)
+    p.begin_rerun("second", enabled=True)
+    p.end_rerun()
+    assert not p.hooked
+    assert [(r["label"], r["interrupted"]) for r in p.reruns] == [("first", True), ("second", False)]
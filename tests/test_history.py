@@ -0,0 +1,50 @@
+import pytest
+
+from tracker import fetch_rows, get_conn, history_page, import_logs
+
+
+def _walk(page_size, **filters):
+    ids, before = [], None
+    while True:
+        page, before = history_page(before_id=before, page_size=page_size, **filters)
+        assert len(page) <= page_size
+        ids += page["id"].tolist()
+        if before is None:
+            return ids
+
+
+@pytest.mark.parametrize("filters, where", [
+    ({}, "1"),
+    ({"domain": "coding"}, "t.domain = 'Coding'"),
+    ({"task": "sql"}, "t.task = 'SQL'"),
+    ({"date_from": "2025-01-01", "date_to": "2025-03-31"}, "l.date BETWEEN '2025-01-01' AND '2025-03-31'"),
+    ({"domain": "Business", "date_to": "2024-12-31"}, "t.domain = 'Business' AND l.date <= '2024-12-31'"),
+    ({"task": "No Such Task"}, "0"),
+])
+def test_pages_walk_every_matching_log_newest_first(history, filters, where):
+    import_logs(history(700, tasks=None))
+    expected = [i for (i,) in fetch_rows(f"SELECT l.id FROM logs l JOIN tasks t ON t.id = l.task_id WHERE {where}"
+                                         " ORDER BY l.id DESC")]
+    for page_size in (1, 37, 1000):
+        assert _walk(page_size, **filters) == expected
+
+
+def test_last_full_page_has_no_cursor(history):
+    import_logs(history(40))
+    page, before = history_page(page_size=40)
+    assert len(page) == 40 and before is None
+
+
+@pytest.mark.parametrize("filters, index", [({"task": "SQL"}, "idx_logs_task_id"),
+                                            ({"domain": "Coding"}, "idx_logs_domain_id")])
+def test_filtered_pages_are_index_range_scans(history, filters, index):
+    import_logs(history(300))
+    statements = []
+    get_conn().set_trace_callback(statements.append)
+    try:
+        history_page(before_id=200, page_size=20, **filters)
+    finally:
+        get_conn().set_trace_callback(None)
+    sql = next(s for s in statements if s.startswith("SELECT l.id"))
+    plan = " | ".join(r[-1] for r in get_conn().execute("EXPLAIN QUERY PLAN " + sql))
+    assert index in plan and "TEMP B-TREE" not in plan, plan
@@ -0,0 +1,67 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from tracker import as_user, build_checkpoints, execute, fetch_df, fetch_rows, import_logs, log_progress, state_as_of
+from tracker.db import LOG_INDEXES
+
+HISTORY = dict(n=400, seed=3, days=900, tasks=5)
+
+
+def _recent_week(today):
+    for i in range(6, -1, -1):
+        log_progress("Coding", "SQL", 30, day=today - dt.timedelta(days=i))
+
+
+def _snapshot():
+    return (fetch_df("SELECT id, xp, streak, last_done, locked FROM tasks ORDER BY id").values.tolist(),
+            fetch_df("SELECT date, task_id, minutes, xp_gain FROM logs ORDER BY task_id, date, minutes, xp_gain")
+            .values.tolist())
+
+
+def _replay(df):
+    for i in np.lexsort((np.arange(len(df)), pd.to_datetime(df["date"]).to_numpy())):
+        r = df.iloc[i]
+        log_progress(r["domain"], r["task"], int(r["minutes"]), day=r["date"], learn=False)
+
+
+def test_import_matches_sequential_log_progress(user, history):
+    df = history(**HISTORY)
+    import_logs(df)
+    imported = _snapshot()
+    with as_user(f"{user}-seq"):
+        _replay(df)
+        assert _snapshot() == imported
+
+
+def test_import_older_than_last_done_merges_into_timeline(user, history, today):
+    _recent_week(today)
+    df = history(**HISTORY)
+    import_logs(df)
+    imported = _snapshot()
+    with as_user(f"{user}-seq"):
+        _recent_week(today)
+        _replay(df)
+        assert _snapshot() == imported
+
+
+def test_import_leaves_tasks_equal_to_state_as_of_today(history, today):
+    _recent_week(today)
+    import_logs(history(**HISTORY))
+    tasks = fetch_df("SELECT domain, task, xp, streak FROM tasks").set_index(["domain", "task"]).sort_index()
+    asof = state_as_of(today).set_index(["domain", "task"])[["xp", "streak"]].sort_index()
+    assert (tasks.values == asof.values).all()
+
+
+def test_import_checkpoints_match_a_rebuild_from_the_logs(history, today):
+    df = history(**HISTORY)
+    cut = (today - dt.timedelta(days=300)).isoformat()
+    import_logs(df[df["date"] < cut])   # empty table: indexes dropped and rebuilt
+    log_progress("Coding", "SQL", 30, day=cut)
+    import_logs(df[df["date"] >= cut])   # onto a larger table, after the checkpoints kept
+    checkpoints = fetch_rows("SELECT * FROM xp_checkpoints ORDER BY date, task_id")
+    execute("DELETE FROM xp_checkpoints")
+    build_checkpoints()
+    assert fetch_rows("SELECT * FROM xp_checkpoints ORDER BY date, task_id") == checkpoints
+    assert set(LOG_INDEXES) <= {n for (n,) in fetch_rows("SELECT name FROM sqlite_master WHERE tbl_name = 'logs'")}
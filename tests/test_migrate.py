@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+from tracker import config, db, fetch_rows, migrate
+
+TASKS = [("Coding", "SQL", 120, 3, "2024-03-09", 30, 2.0, 0), ("Coding", "Python", 40, 1, "2024-03-08", 45, 2.5, 0),
+         ("Body Discipline", "Gym", 15, 2, "2024-03-07", 60, 2.0, 1)]
+
+
+def _old_database(path, n_logs=500):
+    """A file from before the id schema: logs repeat their domain and task names."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE meta(key TEXT PRIMARY KEY, value REAL);
+        CREATE TABLE tasks(id INTEGER PRIMARY KEY AUTOINCREMENT, domain TEXT, task TEXT, xp INTEGER DEFAULT 0,
+                           streak INTEGER DEFAULT 0, last_done DATE, goal_min INTEGER, difficulty REAL,
+                           locked INTEGER DEFAULT 0);
+        CREATE TABLE logs(id INTEGER PRIMARY KEY AUTOINCREMENT, ts TIMESTAMP, date DATE, domain TEXT, task TEXT,
+                          minutes INTEGER, xp_gain INTEGER, ratio REAL, note TEXT);
+    """)
+    conn.executemany("INSERT INTO tasks(domain,task,xp,streak,last_done,goal_min,difficulty,locked) "
+                     "VALUES(?,?,?,?,?,?,?,?)", TASKS)
+    names = [t[:2] for t in TASKS] + [("Gone", "Ghost")]   # a log whose task was deleted
+    conn.executemany("INSERT INTO logs(ts,date,domain,task,minutes,xp_gain,ratio,note) VALUES(?,?,?,?,?,?,?,?)",
+                     [(f"2024-01-01T00:00:{i % 60:02d}", f"2024-{1 + i % 3:02d}-{1 + i % 28:02d}", *names[i % len(names)],
+                       5 + i % 90, i % 17, round((i % 9) / 8, 3), f"n{i}") for i in range(n_logs)])
+    conn.execute("DELETE FROM logs WHERE id = (SELECT MAX(id) FROM logs)")   # its id must not be reused
+    conn.commit()
+    logs = conn.execute("SELECT id, date, domain, task, minutes, xp_gain, ratio, note FROM logs ORDER BY id").fetchall()
+    conn.close()
+    return logs
+
+
+def _migrated_logs():
+    return [tuple(r) for r in fetch_rows("""SELECT l.id, l.date, t.domain, t.task, l.minutes, l.xp_gain, l.ratio, l.note
+                                            FROM logs l JOIN tasks t ON t.id = l.task_id ORDER BY l.id""")]
+
+
+def _assert_migrated(old_logs):
+    assert not migrate.pending()
+    assert _migrated_logs() == old_logs
+    assert fetch_rows("SELECT seq FROM sqlite_sequence WHERE name='logs'")[0][0] == old_logs[-1][0] + 1
+    tables = {r[0] for r in fetch_rows("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert not tables & {"logs_v2", "migrate_names"}
+    assert not fetch_rows("SELECT 1 FROM meta WHERE key='migrate:logs'")
+    assert [tuple(r) for r in fetch_rows("SELECT domain, task, xp, streak, last_done, goal_min, difficulty, locked "
+                                         "FROM tasks ORDER BY id LIMIT 3")] == TASKS
+    assert fetch_rows("SELECT COUNT(*) FROM tasks WHERE task_key IS NULL OR domain_id IS NULL")[0][0] == 0
+
+
+def test_migration_keeps_every_log(user, monkeypatch):
+    monkeypatch.setattr(config, "MIGRATE_CHUNK", 64)
+    old_logs = _old_database(db.user_db_path(user))
+    _assert_migrated(old_logs)
+    assert fetch_rows("SELECT SUM(minutes) FROM daily_rollup")[0][0] == sum(r[4] for r in old_logs)
+
+
+def test_interrupted_migration_resumes_where_it_stopped(user, monkeypatch):
+    monkeypatch.setattr(config, "MIGRATE_CHUNK", 64)
+    path = db.user_db_path(user)
+    old_logs = _old_database(path)
+    copy_chunk, calls = migrate._copy_chunk, []
+
+    def crash_on_third(conn, chunk):
+        calls.append(chunk)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return copy_chunk(conn, chunk)
+
+    monkeypatch.setattr(migrate, "_copy_chunk", crash_on_third)
+    with pytest.raises(KeyboardInterrupt):
+        db.get_conn()
+    with sqlite3.connect(path) as raw:
+        assert raw.execute("SELECT value FROM meta WHERE key='migrate:logs'").fetchone()[0] == old_logs[127][0]
+        assert raw.execute("SELECT COUNT(*) FROM logs_v2").fetchone()[0] == 128
+    monkeypatch.setattr(migrate, "_copy_chunk", copy_chunk)
+    _assert_migrated(old_logs)
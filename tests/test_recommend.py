@@ -0,0 +1,48 @@
+import datetime as dt
+
+import pytest
+
+from tracker import fetch_rows, get_domain_weights, log_progress, recommend
+from tracker.config import RECOMMENDER
+
+
+def _all(today, **kwargs):
+    n = fetch_rows("SELECT COUNT(*) FROM tasks")[0][0]
+    return recommend(k=n, today=today, **kwargs)
+
+
+def test_top_k_is_the_head_of_the_full_ranking(today):
+    for back, domain, task in ((40, "Business", "Learning"), (10, "Body Discipline", "Workout"), (3, "Coding", "SQL"),
+                               (0, "Coding", "SQL")):
+        log_progress(domain, task, 30, day=today - dt.timedelta(days=back))
+    ranked = _all(today)
+    assert ranked["score"].is_monotonic_decreasing
+    score = dict(zip(ranked["task"], ranked["score"]))
+    for k in (1, 3, 7):
+        top = recommend(k=k, today=today)   # ties may come in any order
+        assert top["score"].tolist() == ranked["score"].head(k).tolist()
+        assert [score[t] for t in top["task"]] == top["score"].tolist()
+
+
+def test_score_is_the_sum_of_its_terms(today):
+    log_progress("Coding", "SQL", 45, day=today - dt.timedelta(days=4))
+    df = _all(today).set_index("task")
+    terms = (df["xp_term"] + df["streak_term"] + df["idle_term"]) * df["weight_factor"]
+    assert (terms - df["score"]).abs().max() < 1e-9
+    sql = df.loc["SQL"]
+    assert sql["idle_term"] == pytest.approx(RECOMMENDER["idle"] * 4 / RECOMMENDER["idle_days"])
+    assert sql["weight_factor"] == pytest.approx(1 + RECOMMENDER["weight_pivot"] - get_domain_weights()["Coding"])
+
+
+def test_never_logged_tasks_count_as_idle_for_the_cap(today):
+    df = _all(today)
+    assert df["last_done"].isna().all()
+    assert (df["idle_term"] == RECOMMENDER["idle"] * RECOMMENDER["idle_cap"]).all()
+
+
+def test_scoring_and_weights_override_the_config(today):
+    log_progress("Coding", "SQL", 120, day=today)
+    assert recommend(k=1, today=today, scoring={"xp": 0, "streak": 0, "idle": 1})["task"][0] != "SQL"
+    weights = {d: 1.0 for d in get_domain_weights()} | {"Coding": -10.0}
+    top = recommend(k=3, today=today, weights=weights)
+    assert (top["domain"] == "Coding").all()
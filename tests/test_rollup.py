@@ -0,0 +1,84 @@
+import datetime as dt
+
+import pytest
+
+from tracker import (assistant_handle, execute, fetch_rows, get_domain_weights, import_logs, log_progress, rebuild_rollup,
+                     self_learning_adjustments, write_version, xp_by_day)
+from tracker.config import LEARN_WINDOW
+from tracker.db import learn_window
+
+
+def _rollup():
+    return fetch_rows("SELECT date, task_id, domain_id, minutes, xp, count FROM daily_rollup ORDER BY date, task_id")
+
+
+def _from_logs():
+    return fetch_rows("SELECT date, task_id, domain_id, SUM(minutes), SUM(xp_gain), COUNT(*) FROM logs"
+                      " GROUP BY date, task_id ORDER BY date, task_id")
+
+
+def test_writes_keep_the_rollup_equal_to_the_logs(history, today):
+    import_logs(history(300))
+    for back in (0, 0, 2, 30):
+        log_progress("Coding", "SQL", 25, day=today - dt.timedelta(days=back))
+    assert _rollup() == _from_logs()
+    rollup = _rollup()
+    execute("DELETE FROM daily_rollup")
+    rebuild_rollup()
+    assert _rollup() == rollup
+
+
+def test_rename_and_reset_keep_the_rollup_in_sync(history):
+    import_logs(history(300))
+    assistant_handle('rename task "SQL" to "Databases"')
+    assert _rollup() == _from_logs()
+    assistant_handle("reset task Databases")
+    assert _rollup() == _from_logs()
+    task_id = fetch_rows("SELECT id FROM tasks WHERE task = 'Databases'")[0][0]
+    assert all(r[1] != task_id for r in _rollup())
+
+
+def test_xp_by_day_covers_the_selected_range():
+    today = dt.date.today()   # the ranges are relative to the clock
+    for back in (0, 20, 80, 400):
+        log_progress("Coding", "SQL", 30, day=today - dt.timedelta(days=back))
+    for days, n in ((30, 2), (90, 3), (365, 3), (None, 4)):
+        df = xp_by_day(days)
+        assert len(df) == n, days
+        assert df["date"].is_monotonic_increasing
+    assert xp_by_day(None)["xp"].sum() == fetch_rows("SELECT SUM(xp_gain) FROM logs")[0][0]
+
+
+def _window():
+    return {t: [round(r, 9) for r in learn_window(t)] for (t,) in fetch_rows("SELECT task_id FROM learn_window")}
+
+
+def test_learn_window_keeps_the_newest_ratios_like_a_rebuild(history, today):
+    import_logs(history(300))
+    for minutes in (10, 90, 45, 60, 5, 30):
+        log_progress("Coding", "SQL", minutes, day=today)
+    sql = fetch_rows("SELECT id FROM tasks WHERE task = 'SQL'")[0][0]
+    assert len(learn_window(sql)) == LEARN_WINDOW
+    assert learn_window(sql)[0] == 30 / fetch_rows("SELECT goal_min FROM logs ORDER BY id DESC LIMIT 1")[0][0]
+    window = _window()
+    rebuild_rollup()
+    assert _window() == window
+
+
+def test_self_learning_reads_the_window_and_writes_only_changes(today):
+    steps = []
+    for _ in range(3):
+        log_progress("Coding", "SQL", 90, day=today)
+        steps.append(fetch_rows("SELECT goal_min, difficulty FROM tasks WHERE task = 'SQL'")[0])
+    assert steps == [(45, 2.0), (45, 2.0), (50, 1.9)]
+    log_progress("Coding", "SQL", 50)   # a 7-day domain average (relative to the clock) inside the no-change band
+    execute("UPDATE learn_window SET ratios = '1.0,1.0,1.0'")
+    version = write_version()
+    self_learning_adjustments("SQL")
+    assert write_version() == version
+
+
+def test_a_missed_week_raises_the_domain_weight():
+    weight = get_domain_weights()["Coding"]
+    log_progress("Coding", "SQL", 5)   # the 7-day window is relative to the clock
+    assert get_domain_weights()["Coding"] == pytest.approx(weight + 0.02)
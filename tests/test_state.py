@@ -0,0 +1,74 @@
+import datetime as dt
+
+import pandas as pd
+
+from tracker import as_user, fetch_df, fetch_rows, import_logs, log_progress, recompute_state, state_as_of
+
+
+def _tasks():
+    return fetch_df("SELECT domain, task, xp, streak, last_done FROM tasks").sort_values(["domain", "task"])
+
+
+def _as_of(day):
+    return state_as_of(day)[["domain", "task", "xp", "streak", "last_done"]].sort_values(["domain", "task"])
+
+
+def _same(a, b):
+    return a.reset_index(drop=True).fillna("").astype(str).equals(b.reset_index(drop=True).fillna("").astype(str))
+
+
+def test_state_as_of_matches_replaying_history_up_to_that_day(user, history, today):
+    df = history()
+    import_logs(df)
+    assert fetch_rows("SELECT COUNT(*) FROM xp_checkpoints")[0][0] > 0
+    days = [today - dt.timedelta(days=n) for n in (1, 45, 200, 365, 500)]
+    days.append(dt.date.fromisoformat(fetch_rows("SELECT MAX(date) FROM xp_checkpoints")[0][0]))
+    for day in days:
+        with as_user(f"{user}-{day}"):
+            import_logs(df[df["date"] <= day.isoformat()])
+            expected = _tasks()
+        assert _same(_as_of(day), expected), day
+
+
+def test_state_as_of_today_matches_tasks(history, today):
+    import_logs(history())
+    assert _same(_as_of(today), _tasks())
+
+
+def test_recompute_state_is_a_no_op_on_consistent_history(history):
+    import_logs(history())
+    tasks = _tasks()
+    logs = fetch_rows("SELECT id, xp_gain FROM logs ORDER BY id")
+    checkpoints = fetch_rows("SELECT * FROM xp_checkpoints ORDER BY date, task_id")
+    assert recompute_state()["gains_changed"] == 0
+    assert _same(_tasks(), tasks)
+    assert fetch_rows("SELECT id, xp_gain FROM logs ORDER BY id") == logs
+    assert fetch_rows("SELECT * FROM xp_checkpoints ORDER BY date, task_id") == checkpoints
+
+
+def test_backdated_log_progress_keeps_tasks_equal_to_a_full_replay(history, today):
+    import_logs(history(200))
+    for back in (3, 40, 400):
+        log_progress("Coding", "SQL", 60, day=today - dt.timedelta(days=back))
+    tasks = _tasks()
+    assert _same(_as_of(today), tasks)
+    assert recompute_state()["gains_changed"] == 0
+    assert _same(_tasks(), tasks)
+
+
+def test_a_backdated_log_rescores_the_logs_after_it(today):
+    for back in (3, 1, 0, 2):
+        log_progress("Coding", "SQL", 45, day=today - dt.timedelta(days=back))
+    assert fetch_rows("SELECT xp, streak FROM tasks WHERE task = 'SQL'") == [(54, 4)]
+    assert recompute_state()["gains_changed"] == 0
+    assert fetch_rows("SELECT xp FROM tasks WHERE task = 'SQL'") == [(54,)]
+
+
+def test_importing_older_history_rescores_the_logs_after_it(today):
+    for back in (3, 1, 0):
+        log_progress("Coding", "SQL", 45, day=today - dt.timedelta(days=back))
+    import_logs(pd.DataFrame([{"date": (today - dt.timedelta(days=2)).isoformat(), "domain": "Coding", "task": "SQL",
+                               "minutes": 45}]))
+    rollup = fetch_rows("SELECT SUM(xp) FROM daily_rollup")
+    assert recompute_state()["gains_changed"] == 0
+    assert fetch_rows("SELECT SUM(xp) FROM daily_rollup") == rollup == fetch_rows("SELECT SUM(xp_gain) FROM logs")
@@ -0,0 +1,45 @@
+import pytest
+
+from tracker import UNLOCK_GRAPH, execute, fetch_rows, maybe_unlock_dependents
+from tracker.engine import UnlockRule, compile_unlocks
+
+
+def _locked(*tasks):
+    marks = ",".join("?" * len(tasks))
+    return dict(fetch_rows(f"SELECT task, locked FROM tasks WHERE task IN ({marks})", tasks))
+
+
+def test_compile_unlocks_builds_the_prerequisite_graph():
+    graph = compile_unlocks({
+        "Python": "SELECT SUM(xp) FROM tasks WHERE task='SQL' AND xp>=300",
+        "Tableau": "select sum(xp) from tasks where task='SQL'   and xp >= 50",
+        "Advanced Diet": "SELECT MAX(streak) FROM tasks WHERE task='Workout' AND streak>=14",
+    })
+    assert graph == {
+        "SQL": [UnlockRule("Python", "SQL", "SUM", "xp", 300), UnlockRule("Tableau", "SQL", "SUM", "xp", 50)],
+        "Workout": [UnlockRule("Advanced Diet", "Workout", "MAX", "streak", 14)],
+    }
+    assert {r.task for r in UNLOCK_GRAPH["Python"]} == {"Tableau", "Power BI", "SAS"}
+
+
+@pytest.mark.parametrize("rule", ["SELECT SUM(xp) FROM tasks WHERE task='SQL' AND streak>=3",
+                                  "SELECT COUNT(*) FROM logs WHERE task='SQL'"])
+def test_compile_unlocks_rejects_rules_it_cannot_evaluate(rule):
+    with pytest.raises(ValueError, match="Unsupported unlock rule"):
+        compile_unlocks({"Python": rule})
+
+
+def test_maybe_unlock_dependents_only_opens_tasks_whose_rule_is_met():
+    execute("UPDATE tasks SET xp=299 WHERE task='SQL'")
+    assert maybe_unlock_dependents("SQL") == []
+    execute("UPDATE tasks SET xp=300 WHERE task='SQL'")
+    assert maybe_unlock_dependents("SQL") == ["Python"]
+    assert _locked("Python", "Tableau") == {"Python": 0, "Tableau": 1}
+    assert maybe_unlock_dependents("SQL") == []
+
+
+def test_unlocking_when_one_dependent_is_already_unlocked():
+    execute("UPDATE tasks SET locked=0 WHERE task='Tableau'")
+    execute("UPDATE tasks SET xp=300 WHERE task='Python'")
+    assert sorted(maybe_unlock_dependents("Python")) == ["Power BI", "SAS"]
+    assert _locked("Tableau", "Power BI", "SAS") == {"Tableau": 0, "Power BI": 0, "SAS": 0}
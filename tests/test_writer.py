@@ -0,0 +1,39 @@
+import contextlib
+import sqlite3
+
+import pytest
+
+from tracker import fetch_rows, writer
+from tracker.writer import WriteQueue
+
+
+def test_a_failing_job_only_undoes_itself(user):
+    def fail():
+        writer.log_progress("Coding", "SQL", 99)
+        raise ValueError("boom")
+
+    q = WriteQueue(user, window=0.2)
+    futures = [q.submit(writer.log_progress, "Coding", "SQL", 10 + i) for i in range(5)]
+    failing = q.submit(fail)
+    futures += [q.submit(writer.log_progress, "Coding", "SQL", 20 + i) for i in range(5)]
+    for f in futures:
+        f.result(timeout=10)
+    with pytest.raises(ValueError):
+        failing.result(timeout=10)
+    q.close(timeout=10)
+    assert fetch_rows("SELECT COUNT(*), SUM(minutes = 99) FROM logs")[0] == (10, 0)
+
+
+def test_futures_fail_when_the_group_cannot_start(user, monkeypatch):
+    @contextlib.contextmanager
+    def locked():
+        raise sqlite3.OperationalError("database is locked")
+        yield
+
+    monkeypatch.setattr(writer, "transaction", locked)
+    q = WriteQueue(user)
+    futures = [q.submit(writer.log_progress, "Coding", "SQL", 10) for _ in range(5)]
+    for f in futures:
+        with pytest.raises(sqlite3.OperationalError):
+            f.result(timeout=10)
+    q.close(timeout=10)
@@ -0,0 +1,24 @@
+"""Headless engine behind the Fear → Top 1% Tracker.
+
+Everything the Streamlit app does to data lives here, so cron jobs and scripts can use the
+same database without importing Streamlit or Plotly:
+
+    from tracker import as_user, log_progress
+    with as_user("alice"):
+        log_progress("Coding", "SQL", 45, "joins")
+
+Command line: ``python -m tracker --help``.
+"""
+from .config import DEFAULT_USER
+from .db import (DB, QUERY_CACHE, as_user, cached_df, cached_rows, configure, current_user, execute, fetch_df,
+                 fetch_rows, get_conn, list_users, rebuild_rollup, set_current_user, transaction, write_version)
+from .archive import archive_logs
+from .engine import (UNLOCK_GRAPH, UNLOCK_RULES, build_checkpoints, calc_decay, domain_summary, export_logs,
+                     get_domain_weights,
+                     get_level, history_page, import_logs, is_unlocked, log_progress, log_progress_many,
+                     maybe_unlock_all, maybe_unlock_dependents, read_log_file, recommend, recompute_state,
+                     self_learning_adjustments, set_domain_weight, set_goal, state_as_of, tasks_table, trend, xp_by_day,
+                     xp_gain_for)
+from .diagnostics import PROFILER, Profiler
+from .writer import WRITER, submit, submit_goal, submit_log, submit_weight
+from .assistant import ASSIST_HELP, CommandError, assistant_handle, assistant_run_script, parse_command, run_command
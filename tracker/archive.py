@@ -0,0 +1,322 @@
+"""Cold storage for old logs: compressed column files next to the database.
+
+`archive_logs()` moves whole months of logs older than ARCHIVE_HORIZON_DAYS out of the
+hot `logs` table into one NumPy .npz file per month under `<database name>.archive/`.
+A file holds the log columns as arrays (ts and note as UTF-8 blobs plus offsets, decoded
+only for the rows a query returns), rows in (date, id) order. `archive_segments` in the database is the manifest: month, file and
+id/date ranges, so readers only open the months a query can touch.
+
+Files are never changed in place. Archiving more rows of a month, recomputed XP gains
+and task resets write a new version of the month's file and repoint the manifest in the
+same transaction that changes the hot rows, so a crash or rollback leaves the previous
+version in use. Files the manifest no longer names are removed by the next archive_logs().
+
+Rollups, learning windows and checkpoints cover archived logs like any others; the
+engine's history, as-of, recompute and export read hot and archived rows together.
+"""
+import datetime as dt
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from . import config
+from .db import cached_rows, current_user, execute, get_conn, transaction, user_db_path
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# column -> dtype in the files; goal_min -1 and difficulty NaN stand for NULL, dates are epoch days
+NUMERIC = {"id": "int64", "date": "int32", "task_id": "int32", "domain_id": "int32", "minutes": "int32",
+           "xp_gain": "int32", "ratio": "float64", "goal_min": "int32", "difficulty": "float64"}
+STRINGS = ("ts", "note")
+COLUMNS = tuple(NUMERIC) + STRINGS
+CACHE_ROWS = 1_000_000   # decoded months kept in memory (~80 bytes a row)
+
+_CACHE = OrderedDict()   # file path -> (month, rows); names are never reused, so never stale
+_CACHE_ROWS = 0
+_CACHE_LOCK = threading.Lock()
+
+def archive_dir() -> Path:
+    """The current user's archive folder: `tracker.archive/` next to `tracker.db`."""
+    db = user_db_path(current_user())
+    return db.with_name(db.stem + ".archive")
+
+def segments(after=None, until=None) -> list:
+    """Manifest rows (month, file, rows, first_id, last_id, first_date, last_date) of the
+    archived months holding logs dated after `after` and on or before `until`."""
+    return cached_rows("SELECT month, file, rows, first_id, last_id, first_date, last_date FROM archive_segments"
+                       " WHERE (? IS NULL OR last_date > ?) AND (? IS NULL OR first_date <= ?) ORDER BY month",
+                       (after, after, until, until))
+
+# ---------- month files ----------
+def _from_rows(rows) -> dict:
+    """Column arrays from logs rows selected as COLUMNS."""
+    import numpy as np
+    cols = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    out = {}
+    for i, (name, dtype) in enumerate(NUMERIC.items()):
+        vals = cols[i]
+        if name == "date":
+            out[name] = np.array(vals, dtype="datetime64[D]").astype(np.int32)
+        elif name == "goal_min":
+            out[name] = np.array([-1 if v is None else v for v in vals], dtype=dtype)
+        else:
+            out[name] = np.array(vals, dtype=dtype)
+    for i, name in enumerate(STRINGS, len(NUMERIC)):
+        out[name] = np.array(["" if v is None else v for v in cols[i]], dtype=object)
+    return out
+
+class _Strings:
+    """A packed string column (UTF-8 blob + offsets), decoded only for the rows indexed."""
+
+    def __init__(self, off, data):
+        self.off, self.data = off, data
+
+    def __len__(self):
+        return len(self.off) - 1
+
+    def __getitem__(self, idx):
+        import numpy as np
+        rows = np.arange(len(self))[idx]
+        out = np.empty(len(rows), dtype=object)
+        out[:] = [self.data[a:b].decode() for a, b in zip(self.off[rows].tolist(), self.off[rows + 1].tolist())]
+        return out
+
+def _take(month, idx) -> dict:
+    return {k: v[idx] for k, v in month.items()}
+
+def _concat(a, b) -> dict:
+    import numpy as np
+    return {k: np.concatenate([a[k][:], b[k][:]]) for k in COLUMNS}
+
+def _read(file, cache=True) -> dict:
+    global _CACHE_ROWS
+    import numpy as np
+    path = str(archive_dir() / file)
+    with _CACHE_LOCK:
+        if path in _CACHE:
+            _CACHE.move_to_end(path)
+            return _CACHE[path][0]
+    with np.load(path) as z:
+        month = {k: z[k] for k in NUMERIC}
+        for name in STRINGS:
+            month[name] = _Strings(z[f"{name}_off"], z[f"{name}_data"].tobytes())
+    if cache:
+        with _CACHE_LOCK:
+            if path not in _CACHE:
+                _CACHE[path] = (month, len(month["id"]))
+                _CACHE_ROWS += len(month["id"])
+            while _CACHE_ROWS > CACHE_ROWS and len(_CACHE) > 1:
+                _CACHE_ROWS -= _CACHE.popitem(last=False)[1][1]
+    return month
+
+def _evict(path):
+    global _CACHE_ROWS
+    with _CACHE_LOCK:
+        hit = _CACHE.pop(str(path), None)
+        if hit is not None:
+            _CACHE_ROWS -= hit[1]
+
+def _store(month_key, month):
+    """Write `month` as a new version of its file and repoint the manifest (inside a transaction)."""
+    import numpy as np
+    conn = get_conn()
+    if len(month["id"]) == 0:
+        conn.execute("DELETE FROM archive_segments WHERE month=?", (month_key,))
+        return
+    month = _take(month, np.lexsort((month["id"], month["date"])))
+    # one counter for all months, so a name is never reused (even after `reset all` empties the manifest)
+    version = int(conn.execute("INSERT INTO meta(key,value) VALUES('archive:version',1) "
+                               "ON CONFLICT(key) DO UPDATE SET value=value+1 RETURNING value").fetchone()[0])
+    arrays = {k: month[k] for k in NUMERIC}
+    for name in STRINGS:
+        encoded = [s.encode() for s in month[name]]
+        arrays[f"{name}_off"] = np.concatenate([[0], np.cumsum([len(e) for e in encoded])]).astype(np.int64)
+        arrays[f"{name}_data"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    directory = archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    file = f"logs-{month_key}.v{version}.npz"
+    tmp = directory / (file + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, directory / file)
+    _evict(directory / file)   # a rolled-back transaction can hand the same version out again
+    days = month["date"].astype("datetime64[D]")
+    conn.execute("INSERT OR REPLACE INTO archive_segments(month,file,version,rows,first_id,last_id,first_date,last_date)"
+                 " VALUES(?,?,?,?,?,?,?,?)",
+                 (month_key, file, version, len(month["id"]), int(month["id"].min()), int(month["id"].max()),
+                  str(days.min()), str(days.max())))
+
+def _rewrite(change):
+    """Apply change(month) -> new month or None (unchanged) to every archived month."""
+    for month_key, file, *_ in segments():
+        new = change(_read(file, cache=False))
+        if new is not None:
+            _store(month_key, new)
+
+def _prune():
+    """Delete month files the manifest no longer names (holds the write lock while it looks)."""
+    directory = archive_dir()
+    if not directory.is_dir():
+        return 0
+    with transaction() as conn:
+        live = {f for (f,) in conn.execute("SELECT file FROM archive_segments")}
+        stale = [p for p in directory.iterdir() if p.name.startswith("logs-") and p.name not in live]
+        for p in stale:
+            p.unlink()
+    return len(stale)
+
+# ---------- the archive job ----------
+def archive_logs(horizon_days=None, today=None) -> dict:
+    """Move logs dated before the first day of the month `horizon_days` ago to month files.
+
+    Runs one transaction per month, so memory stays at one month of logs and other
+    connections get the lock in between. Returns {"rows", "months", "cutoff", "pruned"}.
+    """
+    horizon = config.ARCHIVE_HORIZON_DAYS if horizon_days is None else int(horizon_days)
+    cutoff = ((today or dt.date.today()) - dt.timedelta(days=horizon)).replace(day=1).isoformat()
+    conn = get_conn()
+    months = [m for (m,) in conn.execute("SELECT DISTINCT substr(date, 1, 7) FROM logs WHERE date < ? ORDER BY 1",
+                                         (cutoff,)).fetchall()]
+    moved = 0
+    for month_key in months:
+        first = f"{month_key}-01"
+        nxt = (dt.date.fromisoformat(first) + dt.timedelta(days=31)).replace(day=1).isoformat()
+        with transaction():
+            rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM logs WHERE date >= ? AND date < ?",
+                                (first, nxt)).fetchall()
+            month = _from_rows(rows)
+            old = conn.execute("SELECT file FROM archive_segments WHERE month=?", (month_key,)).fetchone()
+            if old is not None:
+                month = _concat(_read(old[0], cache=False), month)
+            _store(month_key, month)
+            execute("DELETE FROM logs WHERE date >= ? AND date < ?", (first, nxt))
+        moved += len(rows)
+    return {"rows": moved, "months": len(months), "cutoff": cutoff, "pruned": _prune()}
+
+# ---------- reads ----------
+def _frame(parts, columns=COLUMNS) -> "pd.DataFrame":
+    """DataFrame of month slices: `date` as ISO strings, NULL goal_min as NaN."""
+    import numpy as np
+    import pandas as pd
+    out = pd.DataFrame({k: np.concatenate([p[k] for p in parts]) if parts else np.empty(0, dtype=NUMERIC.get(k, object))
+                        for k in columns})
+    if "date" in out:
+        out["date"] = np.datetime_as_string(out["date"].to_numpy(np.int64).astype("datetime64[D]"), unit="D")
+    if "goal_min" in out:
+        out["goal_min"] = out["goal_min"].where(out["goal_min"] >= 0)
+    return out
+
+def _day(iso) -> int:
+    import numpy as np
+    return int(np.datetime64(str(iso), "D").astype(np.int64))
+
+def cold_logs(after=None, until=None, columns=COLUMNS) -> "pd.DataFrame":
+    """Archived logs dated after `after` and on or before `until` (ISO dates; None = open)."""
+    import numpy as np
+    parts = []
+    for _, file, *_ in segments(after, until):
+        month = _read(file)
+        keep = np.ones(len(month["id"]), dtype=bool)
+        if after is not None: keep &= month["date"] > _day(after)
+        if until is not None: keep &= month["date"] <= _day(until)
+        parts.append({k: month[k][keep] for k in columns})
+    return _frame(parts, columns)
+
+def newest(k, before_id=None, domain_id=None, task_ids=None, date_from=None, date_to=None, above_id=None):
+    """The `k` archived logs with the highest ids below `before_id` that match the filters,
+    newest first; months holding nothing above `above_id` are not opened."""
+    import numpy as np
+    after = None if date_from is None else (dt.date.fromisoformat(str(date_from)) - dt.timedelta(days=1)).isoformat()
+    months = sorted(segments(after, None if date_to is None else str(date_to)), key=lambda m: -m[4])
+    parts, top = [], []   # top: the best k ids so far, descending
+    for _, file, _, first_id, last_id, _, _ in months:
+        floor = max(above_id or 0, top[k - 1] if len(top) >= k else 0)
+        if last_id <= floor:
+            break   # months are in last_id order: nothing further can make the page
+        if before_id is not None and first_id >= before_id:
+            continue
+        month = _read(file)
+        keep = month["id"] > floor
+        if before_id is not None: keep &= month["id"] < before_id
+        if domain_id is not None: keep &= month["domain_id"] == domain_id
+        if task_ids is not None: keep &= np.isin(month["task_id"], task_ids)
+        if date_from is not None: keep &= month["date"] >= _day(date_from)
+        if date_to is not None: keep &= month["date"] <= _day(date_to)
+        idx = np.flatnonzero(keep)
+        idx = idx[np.argsort(-month["id"][idx], kind="stable")[:k]]
+        if len(idx):
+            parts.append(_take(month, idx))
+            top = sorted(top + month["id"][idx].tolist(), reverse=True)[:k]
+    out = _frame(parts)
+    return out.sort_values("id", ascending=False).head(k).reset_index(drop=True)
+
+def iter_months():
+    """Every archived month (column arrays), oldest first, one decoded at a time."""
+    for _, file, *_ in segments():
+        yield _read(file, cache=False)
+
+# ---------- derived data and edits ----------
+def rollup_rows(task_id=None) -> list:
+    """daily_rollup deltas (date, task_id, domain_id, minutes, xp, count, ratio_sum) of archived logs."""
+    import numpy as np
+    import pandas as pd
+    out = []
+    for month in iter_months():
+        df = pd.DataFrame({k: month[k] for k in ("date", "task_id", "domain_id", "minutes", "xp_gain", "ratio")})
+        if task_id is not None:
+            df = df[df["task_id"] == task_id]
+        g = df.groupby(["date", "task_id", "domain_id"], sort=False).agg(
+            minutes=("minutes", "sum"), xp=("xp_gain", "sum"), count=("xp_gain", "size"), ratio_sum=("ratio", "sum"))
+        g = g.reset_index()
+        g["date"] = np.datetime_as_string(g["date"].to_numpy().astype("datetime64[D]"), unit="D")
+        out += g.astype({"task_id": int, "domain_id": int}).itertuples(index=False, name=None)
+    return out
+
+def recent_ratios(n, task_id=None) -> dict:
+    """{task_id: [(log id, ratio), ...]} — each task's `n` highest-id archived ratios."""
+    best = {}
+    for month in iter_months():
+        for lid, t, r in zip(month["id"].tolist(), month["task_id"].tolist(), month["ratio"].tolist()):
+            if task_id is None or t == task_id:
+                best.setdefault(t, []).append((lid, r))
+        for t in best:
+            best[t] = sorted(best[t], reverse=True)[:n]
+    return best
+
+def update_gains(ids, gains):
+    """Set xp_gain of archived logs by id (ids not archived are ignored)."""
+    import numpy as np
+    if not segments():
+        return
+    ids = np.asarray(ids, dtype=np.int64)
+    order = np.argsort(ids)
+    ids, gains = ids[order], np.asarray(gains, dtype=np.int32)[order]
+
+    def change(month):
+        pos = np.clip(np.searchsorted(ids, month["id"]), 0, max(len(ids) - 1, 0))
+        hit = (ids[pos] == month["id"]) if len(ids) else np.zeros(len(month["id"]), dtype=bool)
+        if not hit.any():
+            return None
+        new = dict(month)
+        new["xp_gain"] = month["xp_gain"].copy()
+        new["xp_gain"][hit] = gains[pos[hit]]
+        return new
+    _rewrite(change)
+
+def delete_tasks(task_ids):
+    """Drop the archived logs of these tasks."""
+    import numpy as np
+
+    def change(month):
+        drop = np.isin(month["task_id"], list(task_ids))
+        return _take(month, ~drop) if drop.any() else None
+    _rewrite(change)
+
+def clear():
+    """Forget every archived log (the files go with the next archive_logs())."""
+    execute("DELETE FROM archive_segments")
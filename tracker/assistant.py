@@ -0,0 +1,231 @@
+"""Smart Assistant: natural-language commands that modify the tracker."""
+import datetime as dt
+import re
+import sqlite3
+from typing import NamedTuple
+
+from . import archive
+from .db import ensure_domain, execute, fetch_df, get_conn, insert_task, name_key, rebuild_rollup, transaction
+from .engine import log_progress, set_domain_weight, set_goal
+
+ASSIST_HELP = """
+**Examples**
+- `log 30 min sql`  → log 30 minutes to SQL
+- `log 45 minutes Python "ETL practice"` → with note
+- `log 30 min sql on 2024-05-01` → back-dated log
+- `set goal python 60`
+- `add task "Meditation" under "Body Discipline"`
+- `add domain "Finance"`
+- `rename task "Diet Logging" to "Nutrition Log"`
+- `lock task Highway` / `unlock task Highway`
+- `reset task SQL` / `reset all`
+- `show stats` (quick summary)
+- `rebuild rollups` (recompute dashboard aggregates from the log)
+
+Batch mode takes one command per line (blank lines and `#` comments are skipped); every
+line is validated first and the whole script runs as one transaction.
+"""
+
+class CommandError(ValueError):
+    """A command parsed but cannot be applied (unknown or locked task, ...)."""
+
+# Command grammar in match order. Every pattern is folded into one compiled alternation, so
+# a command is dispatched with a single regex match; `m.lastgroup` names the command.
+_COMMANDS = [
+    ("log",      r"log\s+(?P<log_minutes>\d+)\s*(?:min|mins|minutes|m)?\s+(?P<log_task>[a-zA-Z ]+?)"
+                 r"(?:\s+on\s+(?P<log_day>\d{4}-\d{2}-\d{2}))?(?:\s+\"(?P<log_note>.+)\")?$"),
+    ("set_goal", r"set\s+goal\s+(?P<goal_task>[a-zA-Z ]+)\s+(?P<goal_val>\d+)"),
+    ("add_domain", r"add\s+domain\s+\"(?P<dom>.+)\""),
+    ("add_task", r"add\s+task\s+\"(?P<new_task>.+)\"\s+under\s+\"(?P<new_task_domain>.+)\""),
+    ("rename",   r"rename\s+task\s+\"(?P<old>.+)\"\s+to\s+\"(?P<new>.+)\""),
+    ("lock",     r"(?P<action>lock|unlock)\s+task\s+(?P<lock_task>[a-zA-Z ]+)"),
+    ("reset_all", r"reset all$"),
+    ("reset_task", r"reset\s+task\s+(?P<reset_name>[a-zA-Z ]+)"),
+    ("rebuild",  r"rebuild rollups$"),
+    ("stats",    r"show stats$"),
+]
+_DISPATCH = re.compile("|".join(f"(?P<{name}>{pat})" for name, pat in _COMMANDS))
+
+class Command(NamedTuple):
+    name: str
+    args: dict
+
+def parse_command(cmd: str):
+    """Parse one command line into a Command, or None if it matches no command."""
+    m = _DISPATCH.match(cmd.strip().lower())
+    if m is None:
+        return None
+    name = m.lastgroup
+    g = m.groupdict()
+    if name == "log":
+        args = {"minutes": int(g["log_minutes"]), "task": g["log_task"].strip().title(),
+                "note": g["log_note"] or "", "day": g["log_day"]}
+    elif name == "set_goal":
+        args = {"task": g["goal_task"].strip().title(), "value": int(g["goal_val"])}
+    elif name == "add_domain":
+        args = {"domain": g["dom"].strip().title()}
+    elif name == "add_task":
+        args = {"task": g["new_task"].strip().title(), "domain": g["new_task_domain"].strip().title()}
+    elif name == "rename":
+        args = {"old": g["old"].strip().title(), "new": g["new"].strip().title()}
+    elif name == "lock":
+        args = {"action": g["action"], "task": g["lock_task"].strip().title()}
+    elif name == "reset_task":
+        args = {"task": g["reset_name"].strip().title()}
+    else:
+        args = {}
+    return Command(name, args)
+
+def _task_row(task):
+    return get_conn().execute("SELECT domain,task,locked FROM tasks WHERE task_key=?", (name_key(task),)).fetchone()
+
+def run_command(c: Command) -> str:
+    """Apply a parsed command; raises CommandError when it cannot be applied."""
+    a = c.args
+    if c.name == "log":
+        row = _task_row(a["task"])
+        if row is None: raise CommandError(f"Task '{a['task']}' not found.")
+        if int(row[2])==1: raise CommandError(f"Task '{a['task']}' is locked.")
+        if a["day"]:
+            try:
+                dt.date.fromisoformat(a["day"])
+            except ValueError:
+                raise CommandError(f"Invalid date {a['day']}.") from None
+        log_progress(row[0], row[1], a["minutes"], a["note"], day=a["day"])
+        return f"Logged {a['minutes']} min to {a['task']}" + (f" on {a['day']}." if a["day"] else ".")
+
+    if c.name == "set_goal":
+        set_goal(a["task"], a["value"])
+        return f"Set goal for {a['task']} to {a['value']} min."
+
+    if c.name == "add_domain":
+        # weight default 0.12
+        with transaction():
+            ensure_domain(a["domain"])
+            set_domain_weight(a["domain"], 0.12)
+        return f"Added domain '{a['domain']}' (no tasks yet). Use: add task \"X\" under \"{a['domain']}\"."
+
+    if c.name == "add_task":
+        # create with default goal 20/difficulty 2
+        try:
+            with transaction():
+                insert_task(a["domain"], a["task"], 20, 2.0)
+        except sqlite3.IntegrityError:
+            raise CommandError(f"Task '{a['task']}' already exists under '{a['domain']}'.") from None
+        return f"Added task '{a['task']}' under '{a['domain']}'."
+
+    if c.name == "rename":
+        old, new = a["old"], a["new"]
+        # logs and everything derived from them refer to the task by id: one row changes
+        try:
+            execute("UPDATE tasks SET task=?, task_key=? WHERE task_key=?", (new, name_key(new), name_key(old)))
+        except sqlite3.IntegrityError:
+            raise CommandError(f"Task '{new}' already exists in that domain.") from None
+        return f"Renamed task '{old}' to '{new}'."
+
+    if c.name == "lock":
+        val = 1 if a["action"]=="lock" else 0
+        execute("UPDATE tasks SET locked=? WHERE task_key=?", (val, name_key(a["task"])))
+        return f"{a['action'].title()}ed task '{a['task']}'."
+
+    if c.name == "reset_all":
+        with transaction():
+            execute("DELETE FROM logs")
+            execute("DELETE FROM daily_rollup")
+            execute("DELETE FROM learn_window")
+            execute("DELETE FROM xp_checkpoints")
+            archive.clear()
+            execute("UPDATE tasks SET xp=0, streak=0, last_done=NULL, goal_min=goal_min, difficulty=difficulty")
+        return "All progress reset."
+
+    if c.name == "reset_task":
+        task = a["task"]
+        ids = "(SELECT id FROM tasks WHERE task_key=?)"
+        with transaction():
+            execute("UPDATE tasks SET xp=0, streak=0, last_done=NULL WHERE task_key=?", (name_key(task),))
+            for table in ("logs", "daily_rollup", "learn_window", "xp_checkpoints"):
+                execute(f"DELETE FROM {table} WHERE task_id IN {ids}", (name_key(task),))
+            archive.delete_tasks([i for (i,) in get_conn().execute("SELECT id FROM tasks WHERE task_key=?",
+                                                                   (name_key(task),))])
+        return f"Reset task '{task}'."
+
+    if c.name == "rebuild":
+        rebuild_rollup()
+        return "Rebuilt daily rollups from the activity log."
+
+    if c.name == "stats":
+        snap = fetch_df("SELECT domain, SUM(xp) AS xp, AVG(streak) AS avg_streak FROM tasks GROUP BY domain ORDER BY xp DESC")
+        return snap.to_string(index=False)
+
+    raise CommandError(f"Unsupported command {c.name!r}.")
+
+def assistant_handle(cmd: str) -> str:
+    c = parse_command(cmd)
+    if c is None:
+        return "Sorry, I couldn't parse that. Try examples below."
+    try:
+        return run_command(c)
+    except CommandError as e:
+        return str(e)
+
+# ---------- batch mode ----------
+class LineResult(NamedTuple):
+    line: int
+    text: str
+    ok: bool
+    message: str
+
+def _validate(commands) -> dict:
+    """Check every command against the current tasks, simulating the batch's own
+    adds/renames/locks in order. Returns {line number: error message}."""
+    known = {k: int(locked) for k, locked in get_conn().execute("SELECT task_key, locked FROM tasks")}
+    errors = {}
+    for ln, c in commands:
+        a = c.args
+        if c.name == "log":
+            key = name_key(a["task"])
+            if key not in known: errors[ln] = f"Task '{a['task']}' not found."
+            elif known[key]: errors[ln] = f"Task '{a['task']}' is locked."
+            elif a["day"]:
+                try:
+                    dt.date.fromisoformat(a["day"])
+                except ValueError:
+                    errors[ln] = f"Invalid date {a['day']}."
+        elif c.name == "add_task":
+            known.setdefault(name_key(a["task"]), 0)
+        elif c.name == "rename":
+            if name_key(a["old"]) in known:
+                known[name_key(a["new"])] = known.pop(name_key(a["old"]))
+        elif c.name == "lock":
+            if name_key(a["task"]) in known:
+                known[name_key(a["task"])] = 1 if a["action"] == "lock" else 0
+    return errors
+
+def assistant_run_script(script: str) -> list:
+    """Run a multi-line command script as one transaction.
+
+    All lines are parsed and validated before anything is written; if any line is invalid
+    (or fails while running) nothing is applied. Returns a LineResult per command line;
+    `ok` is True only for lines that were applied.
+    """
+    lines = [(i, raw.strip()) for i, raw in enumerate(script.splitlines(), 1)]
+    lines = [(i, t) for i, t in lines if t and not t.startswith("#")]
+    parsed = [(i, t, parse_command(t)) for i, t in lines]
+    errors = {i: "Sorry, I couldn't parse that." for i, _, c in parsed if c is None}
+    if not errors:
+        errors = _validate([(i, c) for i, _, c in parsed])
+    if errors:
+        return [LineResult(i, t, False, errors.get(i, "Valid; not run because other lines have errors."))
+                for i, t, _ in parsed]
+    results = []
+    try:
+        with transaction():
+            for i, t, c in parsed:
+                results.append(LineResult(i, t, True, run_command(c)))
+    except CommandError as e:
+        done = len(results)
+        out = [LineResult(i, t, False, "Rolled back.") for i, t, _ in parsed[:done]]
+        out.append(LineResult(parsed[done][0], parsed[done][1], False, str(e)))
+        out += [LineResult(i, t, False, "Not run.") for i, t, _ in parsed[done+1:]]
+        return out
+    return results
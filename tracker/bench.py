@@ -0,0 +1,164 @@
+"""Benchmarks for the tracker's hot paths on synthetic data.
+
+    python -m tracker.bench --sizes 10000,100000,1000000 --out bench.json
+    python -m tracker.bench --sizes 10000 --compare bench.json
+
+Every size gets a fresh database in a temporary directory: the default catalog plus
+synthetic domains/tasks, and `size` log rows spread over `years` of history, loaded with
+`import_logs`. Data is fully determined by the seed and the end date (default today),
+which is recorded in the results; `--compare` reuses the baseline's. Results are written as JSON.
+"""
+import argparse
+import datetime as dt
+import json
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from . import db, engine
+from .config import DEFAULT_DOMAINS
+
+def generate(n_logs, n_domains=8, tasks_per_domain=5, years=3, seed=0, end=None):
+    """Create synthetic tasks in the current user's database and return a log DataFrame.
+
+    Domains beyond the default catalog are named "Synth 1", "Synth 2", ... with tasks
+    "Synth 1 Task 1", ...; logs cover `years` up to `end` (default today).
+    """
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    extra = max(0, n_domains - len(DEFAULT_DOMAINS))
+    with db.transaction():
+        for d in range(1, extra + 1):
+            for t in range(1, tasks_per_domain + 1):
+                db.insert_task(f"Synth {d}", f"Synth {d} Task {t}", int(rng.choice([10, 15, 20, 30, 45, 60])),
+                               float(rng.integers(1, 4)))
+    tasks = db.fetch_df("SELECT domain, task FROM tasks ORDER BY id")
+    end = np.datetime64(end or dt.date.today(), "D")
+    span = int(365 * years)
+    idx = rng.integers(0, len(tasks), n_logs)
+    return pd.DataFrame({
+        "date": np.datetime_as_string(end - rng.integers(1, span + 1, n_logs), unit="D"),
+        "domain": tasks["domain"].to_numpy()[idx],
+        "task": tasks["task"].to_numpy()[idx],
+        "minutes": rng.choice([5, 10, 15, 20, 30, 45, 60, 90, 120], n_logs),
+        "note": "",
+    })
+
+def _time(fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {"runs": repeat, "min_ms": round(samples[0], 4), "median_ms": round(statistics.median(samples), 4),
+            "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 4),
+            "mean_ms": round(statistics.fmean(samples), 4)}
+
+def hot_paths(end):
+    """(name, fn, setup) triples; setup runs untimed before every sample."""
+    cold = db.QUERY_CACHE.clear
+    task = ("Coding", "SQL")
+    return [
+        ("log_progress", lambda: engine.log_progress(*task, 30), None),
+        ("log_progress_many_x10", lambda: engine.log_progress_many([task + (30,)] * 10), None),
+        ("self_learning_adjustments", lambda: db_tx(engine.self_learning_adjustments, "SQL"), None),
+        ("unlock_dependents", lambda: db_tx(engine.maybe_unlock_dependents, "Python"), None),
+        ("unlock_all", lambda: db_tx(engine.maybe_unlock_all), None),
+        ("tasks_table_cold", engine.tasks_table, cold),
+        ("tasks_table_cached", engine.tasks_table, None),
+        ("domain_summary_cold", engine.domain_summary, cold),
+        ("xp_by_day_30d_cold", lambda: engine.xp_by_day(30), cold),
+        ("xp_by_day_1y_cold", lambda: engine.xp_by_day(365), cold),
+        ("xp_by_day_all_cold", lambda: engine.xp_by_day(None), cold),
+        ("trend_minutes_all_cold", lambda: engine.trend("minutes", None), cold),
+        ("history_page_cold", lambda: engine.history_page(None, 50), cold),
+        ("recommend_top5_cold", lambda: engine.recommend(k=5), cold),
+        ("state_as_of_90d_cold", lambda: engine.state_as_of(end - dt.timedelta(days=90)), cold),
+    ]
+
+def db_tx(fn, *args):
+    with db.transaction():
+        return fn(*args)
+
+def run(sizes, n_domains=8, tasks_per_domain=5, years=3, repeat=20, seed=0, end=None):
+    end = end or dt.date.today()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="tracker-bench-") as tmp:
+        db.configure(f"{tmp}/tracker.db")
+        for size in sizes:
+            with db.as_user(f"bench-{size}"):
+                logs = generate(size, n_domains, tasks_per_domain, years, seed, end)
+                t0 = time.perf_counter()
+                engine.import_logs(logs)
+                results.append({"size": size, "op": "import_logs", "runs": 1,
+                                "median_ms": round((time.perf_counter() - t0) * 1000, 4)})
+                for name, fn, setup in hot_paths(end):
+                    fn()  # warm-up (statement cache, page cache, lazy imports)
+                    results.append({"size": size, "op": name, **_time(fn, repeat, setup)})
+        db.DB.close_all()
+    return {
+        "meta": {"timestamp": dt.datetime.now(dt.timezone.utc).isoformat(), "python": platform.python_version(),
+                 "sqlite": sqlite3.sqlite_version, "platform": platform.platform(), "domains": n_domains,
+                 "tasks_per_domain": tasks_per_domain, "years": years, "repeat": repeat, "seed": seed,
+                 "end": end.isoformat()},
+        "results": results,
+    }
+
+def compare(current, baseline, threshold=1.25):
+    """Rows whose median got slower than `threshold` x the baseline's."""
+    base = {(r["size"], r["op"]): r["median_ms"] for r in baseline["results"]}
+    out = []
+    for r in current["results"]:
+        b = base.get((r["size"], r["op"]))
+        if b and r["median_ms"] > b * threshold:
+            out.append({"size": r["size"], "op": r["op"], "baseline_ms": b, "median_ms": r["median_ms"],
+                        "ratio": round(r["median_ms"] / b, 2)})
+    return out
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="tracker.bench", description="Benchmark tracker hot paths on synthetic data.")
+    p.add_argument("--sizes", default="10000,100000", help="comma-separated log row counts")
+    p.add_argument("--domains", type=int, default=8)
+    p.add_argument("--tasks", type=int, default=5, help="tasks per synthetic domain")
+    p.add_argument("--years", type=float, default=3)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--end", type=dt.date.fromisoformat,
+                   help="last day of synthetic history, YYYY-MM-DD (default: the --compare baseline's, else today)")
+    p.add_argument("--out", help="write JSON results here (default: stdout)")
+    p.add_argument("--compare", help="baseline JSON; exit 1 if any op regressed past --threshold")
+    p.add_argument("--threshold", type=float, default=1.25)
+    args = p.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    end = args.end
+    if end is None and baseline and "end" in baseline["meta"]:
+        end = dt.date.fromisoformat(baseline["meta"]["end"])
+    report = run([int(s) for s in args.sizes.split(",")], args.domains, args.tasks, args.years, args.repeat, args.seed,
+                 end)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if baseline:
+        regressions = compare(report, baseline, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['op']} @ {r['size']}: {r['baseline_ms']} → {r['median_ms']} ms (x{r['ratio']})",
+                  file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
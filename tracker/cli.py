@@ -0,0 +1,205 @@
+"""Command-line entry point: ``python -m tracker <command> ...``.
+
+Logging and querying go straight to SQLite; pandas is only loaded by `import`, `archive`
+and history over archived logs.
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+from . import config, db, engine
+from .assistant import assistant_handle, assistant_run_script
+from .diagnostics import PROFILER
+
+def _print_rows(headers, rows, as_json=False):
+    rows = [tuple(r) for r in rows]
+    if as_json:
+        print(json.dumps([dict(zip(headers, r)) for r in rows], default=str))
+        return
+    cells = [tuple("" if v is None else str(v) for v in r) for r in rows]
+    widths = [max([len(h)] + [len(r[i]) for r in cells]) for i, h in enumerate(headers)]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for r in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(r, widths)))
+
+def _find_task(name, domain=None):
+    sql, params = "SELECT domain, task FROM tasks WHERE task_key=?", [db.name_key(name)]
+    if domain:
+        sql += " AND domain_id=(SELECT id FROM domains WHERE name_key=?)"; params.append(db.name_key(domain))
+    rows = db.fetch_rows(sql, params)
+    if not rows:
+        raise SystemExit(f"Task '{name}' not found.")
+    if len(rows) > 1:
+        raise SystemExit(f"Task '{name}' exists in several domains; pass --domain.")
+    return rows[0]
+
+def cmd_log(args):
+    domain, task = _find_task(args.task, args.domain)
+    engine.log_progress(domain, task, args.minutes, args.note, day=args.date)
+    print(f"Logged {args.minutes} min to {domain} → {task}.")
+
+def cmd_import(args):
+    res = engine.import_logs(engine.read_log_file(args.file))
+    print(json.dumps(res) if args.json else f"Imported {res['rows']} logs across {res['tasks']} tasks.")
+
+def cmd_tasks(args):
+    headers = ["domain", "task", "xp", "streak", "last_done", "goal_min", "difficulty", "locked"]
+    rows = db.fetch_rows(f"SELECT {', '.join(headers)} FROM tasks ORDER BY domain, task")
+    _print_rows(headers + ["level"], [r + (engine.get_level(int(r[2])),) for r in rows], args.json)
+
+def cmd_stats(args):
+    _print_rows(["domain", "xp", "avg_streak"], db.fetch_rows(
+        "SELECT domain, SUM(xp), ROUND(AVG(streak), 2) FROM tasks GROUP BY domain ORDER BY SUM(xp) DESC"), args.json)
+
+def cmd_history(args):
+    headers = ["id", "date", "domain", "task", "minutes", "xp_gain", "note"]
+    if db.fetch_rows("SELECT 1 FROM archive_segments LIMIT 1"):
+        page, _ = engine.history_page(page_size=args.limit, domain=args.domain, task=args.task, date_from=args.since)
+        _print_rows(headers, page[headers].itertuples(index=False), args.json)
+        return
+    where, params = [], []
+    if args.domain: where.append("l.domain_id=(SELECT id FROM domains WHERE name_key=?)"); params.append(db.name_key(args.domain))
+    if args.task:
+        ids = [i for (i,) in db.fetch_rows("SELECT id FROM tasks WHERE task_key=?", (db.name_key(args.task),))] or [None]
+        where.append(f"l.task_id IN ({','.join('?' * len(ids))})"); params += ids
+    if args.since: where.append("l.date>=?"); params.append(args.since)
+    sql = ("SELECT l.id, l.date, t.domain, t.task, l.minutes, l.xp_gain, l.note FROM logs l CROSS JOIN tasks t ON t.id=l.task_id"
+           + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY l.id DESC LIMIT ?")
+    _print_rows(headers, db.fetch_rows(sql, params + [args.limit]), args.json)
+
+def cmd_recommend(args):
+    ranked = engine.recommend(k=args.k)
+    _print_rows(["domain", "task", "score", "goal_min"],
+                ranked[["domain", "task", "score", "goal_min"]].round({"score": 4}).itertuples(index=False), args.json)
+
+def cmd_assistant(args):
+    print(assistant_handle(" ".join(args.command)))
+
+def cmd_batch(args):
+    script = sys.stdin.read() if args.file == "-" else Path(args.file).read_text(encoding="utf-8")
+    results = assistant_run_script(script)
+    _print_rows(["line", "ok", "message"], [(r.line, "ok" if r.ok else "FAIL", r.message) for r in results], args.json)
+    return 0 if all(r.ok for r in results) else 1
+
+def cmd_as_of(args):
+    state = engine.state_as_of(args.date)
+    _print_rows(["domain", "task", "xp", "streak", "last_done", "level"],
+                state[["domain", "task", "xp", "streak", "last_done", "Level"]].astype(object)
+                .where(state.notna(), None).itertuples(index=False), args.json)
+
+def cmd_recompute(args):
+    res = engine.recompute_state()
+    print(json.dumps(res) if args.json else
+          f"Replayed {res['events']} logs into {res['tasks']} tasks; {res['gains_changed']} XP gains changed, "
+          f"{res['checkpoints']} checkpoints written.")
+
+def cmd_migrate(args):
+    # opening the database runs any pending migration; this makes it explicit, with progress
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    config.MIGRATE_CHUNK = args.chunk
+    db.get_conn()
+    added = engine.build_checkpoints()
+    if args.vacuum:
+        db.get_conn().execute("VACUUM")
+    print(f"Schema is current; {added} month-end checkpoints added." + (" Database vacuumed." if args.vacuum else ""))
+
+def cmd_archive(args):
+    from .archive import archive_logs
+    res = archive_logs(args.horizon)
+    if args.vacuum:
+        db.get_conn().execute("VACUUM")
+    print(json.dumps(res) if args.json else
+          f"Archived {res['rows']} logs dated before {res['cutoff']} into {res['months']} month files"
+          f" ({res['pruned']} stale files removed)." + (" Database vacuumed." if args.vacuum else ""))
+
+def cmd_export(args):
+    fmt = args.format or ("jsonl" if args.out and args.out.lower().endswith((".jsonl", ".ndjson")) else "csv")
+    out = open(args.out, "w", encoding="utf-8", newline="") if args.out else sys.stdout
+    try:
+        for chunk in engine.export_logs(fmt, args.chunk):
+            out.write(chunk)
+    finally:
+        if args.out:
+            out.close()
+
+def cmd_rebuild_rollups(args):
+    db.rebuild_rollup()
+    print("Rebuilt daily rollups.")
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="tracker", description="Fear → Top 1% Tracker (headless).")
+    p.add_argument("--db", help="path of the default user's database (default: ./tracker.db)")
+    p.add_argument("--user", default=None, help="user id (default: the default user)")
+    p.add_argument("--json", action="store_true", help="machine-readable output")
+    p.add_argument("--profile", action="store_true", help="print per-query timings and plans (JSON) to stderr")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    s = sub.add_parser("log", help="log minutes to a task")
+    s.add_argument("task"); s.add_argument("minutes", type=int)
+    s.add_argument("--note", default=""); s.add_argument("--domain"); s.add_argument("--date", help="YYYY-MM-DD")
+    s.set_defaults(func=cmd_log)
+
+    s = sub.add_parser("import", help="bulk-import a CSV/JSONL log file")
+    s.add_argument("file"); s.set_defaults(func=cmd_import)
+
+    sub.add_parser("tasks", help="list tasks").set_defaults(func=cmd_tasks)
+    sub.add_parser("stats", help="per-domain summary").set_defaults(func=cmd_stats)
+
+    s = sub.add_parser("history", help="recent logs, newest first")
+    s.add_argument("--limit", type=int, default=20); s.add_argument("--domain"); s.add_argument("--task")
+    s.add_argument("--since", help="YYYY-MM-DD"); s.set_defaults(func=cmd_history)
+
+    s = sub.add_parser("recommend", help="what to work on next")
+    s.add_argument("-k", type=int, default=3); s.set_defaults(func=cmd_recommend)
+
+    s = sub.add_parser("assistant", help="run a Smart Assistant command")
+    s.add_argument("command", nargs="+"); s.set_defaults(func=cmd_assistant)
+
+    s = sub.add_parser("batch", help="run a file of assistant commands in one transaction ('-' = stdin)")
+    s.add_argument("file"); s.set_defaults(func=cmd_batch)
+
+    sub.add_parser("rebuild-rollups", help="recompute dashboard aggregates").set_defaults(func=cmd_rebuild_rollups)
+
+    s = sub.add_parser("as-of", help="task XP, streaks and levels as they were at the end of a day")
+    s.add_argument("date", help="YYYY-MM-DD"); s.set_defaults(func=cmd_as_of)
+
+    sub.add_parser("recompute", help="rebuild XP state from the log with the current scoring rules"
+                   ).set_defaults(func=cmd_recompute)
+
+    s = sub.add_parser("migrate", help="bring an older database to the current schema (resumable)")
+    s.add_argument("--chunk", type=int, default=config.MIGRATE_CHUNK, help="log rows copied per transaction")
+    s.add_argument("--vacuum", action="store_true", help="reclaim the space freed by the old tables afterwards")
+    s.set_defaults(func=cmd_migrate)
+
+    s = sub.add_parser("archive", help="move old logs into compressed month files next to the database")
+    s.add_argument("--horizon", type=int, default=None,
+                   help=f"archive whole months older than this many days (default {config.ARCHIVE_HORIZON_DAYS})")
+    s.add_argument("--vacuum", action="store_true", help="shrink the database file afterwards")
+    s.set_defaults(func=cmd_archive)
+
+    s = sub.add_parser("export", help="stream every log, archived ones included, as CSV or JSONL")
+    s.add_argument("--format", choices=["csv", "jsonl"], help="default: from --out's suffix, else csv")
+    s.add_argument("--out", help="file to write (default: stdout)")
+    s.add_argument("--chunk", type=int, default=10_000, help="rows per chunk")
+    s.set_defaults(func=cmd_export)
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    db.configure(args.db)
+    if args.profile:
+        PROFILER.enabled = PROFILER.explain = True
+        PROFILER.begin_rerun(label=args.cmd)
+        PROFILER.phase(args.cmd)
+    try:
+        db.set_current_user(args.user)
+        return args.func(args) or 0
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if args.profile:
+            PROFILER.end_rerun()
+            print(PROFILER.to_json(), file=sys.stderr)
@@ -0,0 +1,58 @@
+"""Tracker configuration: database locations, catalog defaults and scoring constants."""
+from pathlib import Path
+
+DB_PATH = Path("tracker.db")       # the default user's database (pre-multi-user file)
+USERS_DIR = Path("users")          # one SQLite file per additional user
+DEFAULT_USER = "default"
+# rows copied per transaction when an old database is migrated to the integer-key schema
+MIGRATE_CHUNK = 50_000
+# `archive` moves whole months of logs older than this many days to compressed files
+ARCHIVE_HORIZON_DAYS = 365
+
+DEFAULT_DOMAINS = {
+    "Coding": ["SQL", "Python", "SAS", "Tableau", "Power BI"],
+    "Driving": ["Parking", "Traffic", "Highway"],
+    "Business": ["Learning", "Idea Generation", "Execution"],
+    "Trading": ["Paper Trading", "Backtesting", "Real Trading"],
+    "Body Discipline": ["Workout", "Diet Logging", "Advanced Diet"]
+}
+
+LEVELS = [("Beginner", 0, 99), ("Intermediate", 100, 299), ("Pro", 300, 699), ("Top 1%", 700, 10**9)]
+BASE_XP = {"daily": 10, "weekly": 50, "monthly": 200}
+STREAK_MILESTONES = (5, 10, 20, 30)  # met-goal streak days that earn the weekly bonus
+UNLOCKS = {
+    "Python":        "SELECT SUM(xp) FROM tasks WHERE task='SQL'      AND xp>=300",
+    "Tableau":       "SELECT SUM(xp) FROM tasks WHERE task='Python'   AND xp>=300",
+    "Power BI":      "SELECT SUM(xp) FROM tasks WHERE task='Python'   AND xp>=300",
+    "SAS":           "SELECT SUM(xp) FROM tasks WHERE task='Python'   AND xp>=300",
+    "Highway":       "SELECT SUM(xp) FROM tasks WHERE task='Traffic'  AND xp>=200",
+    "Execution":     "SELECT SUM(xp) FROM tasks WHERE task='Idea Generation' AND xp>=150",
+    "Real Trading":  "SELECT SUM(xp) FROM tasks WHERE task='Paper Trading'   AND xp>=200",
+    "Advanced Diet": "SELECT MAX(streak) FROM tasks WHERE task='Workout'     AND streak>=14",
+}
+# Difficulty (1–3) influences XP; Self-learning will adjust slightly over time
+DEFAULT_DIFFICULTY = {
+    "SQL": 2, "Python": 3, "SAS": 2, "Tableau": 2, "Power BI": 2,
+    "Parking": 1, "Traffic": 2, "Highway": 3,
+    "Learning": 1, "Idea Generation": 2, "Execution": 3,
+    "Paper Trading": 1, "Backtesting": 2, "Real Trading": 3,
+    "Workout": 2, "Diet Logging": 1, "Advanced Diet": 2
+}
+# Daily minutes goals; Self-learning will raise/lower by ±10% when appropriate
+DEFAULT_GOALS = {
+    "SQL": 45, "Python": 45, "SAS": 30, "Tableau": 30, "Power BI": 30,
+    "Parking": 20, "Traffic": 20, "Highway": 20,
+    "Learning": 15, "Idea Generation": 15, "Execution": 30,
+    "Paper Trading": 15, "Backtesting": 30, "Real Trading": 10,
+    "Workout": 30, "Diet Logging": 5, "Advanced Diet": 10
+}
+# Self-learning looks at each task's last LEARN_WINDOW log ratios
+LEARN_WINDOW = 5
+# Domain weights (for recommender); Self-learning updates weekly based on misses
+DEFAULT_WEIGHTS = {"Coding": 0.40, "Body Discipline": 0.20, "Driving": 0.15, "Business": 0.15, "Trading": 0.10}
+# Dashboard trend charts: at most this many points per domain (days are summed into weeks/months/years)
+TREND_POINTS = 200
+# Recommender scoring: (xp*1/(1+xp) + streak*1/(1+streak) + idle*min(idle_cap, idle/idle_days))
+#                      * (1 + weight_pivot - domain weight)
+RECOMMENDER = {"xp": 0.5, "streak": 0.3, "idle": 0.2, "idle_days": 7, "idle_cap": 2.0,
+               "never_idle": 999, "weight_pivot": 0.4, "default_weight": 0.1}
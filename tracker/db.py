@@ -0,0 +1,517 @@
+"""SQLite layer: per-user databases, pooled connections, transactions and the query cache.
+
+Nothing here imports pandas until a DataFrame is actually requested.
+"""
+import contextvars
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import config
+from .diagnostics import PROFILER
+from .config import (DEFAULT_USER, DEFAULT_DOMAINS, DEFAULT_GOALS, DEFAULT_DIFFICULTY, DEFAULT_WEIGHTS, LEARN_WINDOW,
+                     UNLOCKS)
+
+# Every user has their own SQLite file, so one user's writes never take another user's
+# lock. The current user is context-local (set per rerun / per script with `as_user`);
+# get_conn() — and with it all business logic below — resolves to that user's database.
+# One long-lived connection per (user, Streamlit session or plain thread). Pragmas are
+# applied once when the connection is opened; sqlite3 keeps a per-connection LRU of
+# prepared statements, so repeated queries skip the parse/plan step on every rerun.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,       # ~16 MB page cache
+    "mmap_size": 268435456,     # 256 MB memory-mapped I/O
+    "temp_store": "MEMORY",
+}
+STMT_CACHE_SIZE = 256
+MAX_CONNS = 256
+
+_USER_RE = re.compile(r"[a-z0-9_.-]{1,64}")
+_CURRENT_USER = contextvars.ContextVar("tracker_user", default=DEFAULT_USER)
+
+def normalize_user(user) -> str:
+    uid = str(user or DEFAULT_USER).strip().lower()
+    if not _USER_RE.fullmatch(uid) or uid.startswith("."):
+        raise ValueError(f"Invalid user id {user!r} (use letters, digits, '_', '-', '.')")
+    return uid
+
+def current_user() -> str:
+    return _CURRENT_USER.get()
+
+def set_current_user(user) -> str:
+    uid = normalize_user(user)
+    _CURRENT_USER.set(uid)
+    return uid
+
+@contextmanager
+def as_user(user):
+    """Scope every DB call in the block to `user`."""
+    token = _CURRENT_USER.set(normalize_user(user))
+    try:
+        yield
+    finally:
+        _CURRENT_USER.reset(token)
+
+def configure(db_path=None, users_dir=None):
+    """Point the tracker at another database (before the first connection is opened).
+
+    `users_dir` defaults to a `users/` folder next to `db_path`.
+    """
+    if db_path is not None:
+        config.DB_PATH = Path(db_path)
+        config.USERS_DIR = Path(users_dir) if users_dir is not None else config.DB_PATH.parent / "users"
+    elif users_dir is not None:
+        config.USERS_DIR = Path(users_dir)
+
+def user_db_path(user) -> Path:
+    uid = normalize_user(user)
+    return config.DB_PATH if uid == DEFAULT_USER else config.USERS_DIR / f"{uid}.db"
+
+def list_users() -> list:
+    users_dir = config.USERS_DIR
+    users = [p.stem for p in users_dir.glob("*.db")] if users_dir.is_dir() else []
+    return [DEFAULT_USER] + sorted(u for u in users if u != DEFAULT_USER)
+
+def _session_key():
+    if "streamlit" in sys.modules:   # never import streamlit just to find out it isn't running
+        try:
+            from streamlit.runtime.scriptrunner import get_script_run_ctx
+            ctx = get_script_run_ctx(suppress_warning=True)
+            if ctx is not None:
+                return ctx.session_id
+        except Exception:
+            pass
+    return threading.get_ident()
+
+class TrackerConnection(sqlite3.Connection):
+    """sqlite3 connection that knows whether a `transaction()` block is open on it."""
+    tx_depth = 0
+    write_version = None   # meta write_version as last seen by this connection
+    data_version = None    # PRAGMA data_version at the time write_version was read
+
+    # every statement the tracker issues goes through these two (or through fetch_df below),
+    # so they are where the opt-in profiler hooks in
+    def execute(self, sql, params=()):
+        if not PROFILER.hooked:
+            return super().execute(sql, params)
+        t0 = time.perf_counter()
+        cur = super().execute(sql, params)
+        PROFILER.record(self, sql, params, time.perf_counter() - t0)
+        return cur
+
+    def executemany(self, sql, seq):
+        if not PROFILER.hooked:
+            return super().executemany(sql, seq)
+        t0 = time.perf_counter()
+        cur = super().executemany(sql, seq)
+        PROFILER.record(self, sql, None, time.perf_counter() - t0, many=True)
+        return cur
+
+class ConnectionManager:
+    """Hands out one reused sqlite3 connection per (user, session/thread) key (LRU-bounded).
+
+    Eviction skips connections inside a transaction and never closes the evicted one: a
+    thread still holding it keeps working, and it is closed once the last reference is
+    dropped. A user's database is created and seeded on first use in this process.
+    """
+
+    def __init__(self, path_for=user_db_path, max_conns=MAX_CONNS):
+        self.path_for = path_for
+        self.max_conns = max_conns
+        self._lock = threading.Lock()
+        self._init_locks = {}   # per-user, so seeding one database never waits on another
+        self._ready = set()
+        self._initializing = set()
+        self._conns = OrderedDict()
+
+    def _open(self, user):
+        path = self.path_for(user)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Reruns of one session may land on different script threads, hence check_same_thread=False;
+        # a session never runs two reruns concurrently.
+        conn = sqlite3.connect(path, timeout=30, check_same_thread=False,
+                               cached_statements=STMT_CACHE_SIZE, factory=TrackerConnection)
+        for k, v in PRAGMAS.items():
+            conn.execute(f"PRAGMA {k}={v};")
+        return conn
+
+    def get(self):
+        user = current_user()
+        key = (user, _session_key())
+        with self._lock:
+            conn = self._conns.get(key)
+            if conn is not None:
+                self._conns.move_to_end(key)
+                return conn
+            conn = self._conns[key] = self._open(user)
+            if len(self._conns) > self.max_conns:
+                idle = [k for k, c in self._conns.items() if k != key and not (c.tx_depth or c.in_transaction)]
+                for k in idle[:len(self._conns) - self.max_conns]:
+                    del self._conns[k]
+            init_lock = self._init_locks.setdefault(user, threading.RLock())
+        if user not in self._ready:
+            with init_lock:
+                # db_init() calls back into get(); the RLock lets that nested call through
+                if user not in self._ready and user not in self._initializing:
+                    self._initializing.add(user)
+                    try:
+                        db_init()
+                        self._ready.add(user)
+                    except BaseException:
+                        # the next get() must run db_init() again, e.g. to resume an interrupted migration
+                        with self._lock:
+                            self._conns.pop(key, None)
+                        conn.close()
+                        raise
+                    finally:
+                        self._initializing.discard(user)
+        return conn
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._conns.values():
+                conn.close()
+            self._conns.clear()
+
+DB = ConnectionManager()
+
+def get_conn():
+    return DB.get()
+
+# secondary indexes of logs, name -> columns; import_logs drops them around a bulk insert
+# that at least doubles the table and rebuilds them once, which beats maintaining them row by row
+LOG_INDEXES = {
+    "idx_logs_date": "date",
+    "idx_logs_domain_date": "domain_id, date",
+    # keyset pagination of the History page: newest-first by id within a task / domain
+    "idx_logs_task_id": "task_id, id",
+    "idx_logs_domain_id": "domain_id, id",
+}
+
+def create_log_indexes():
+    conn = get_conn()
+    for name, cols in LOG_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON logs({cols})")
+
+def drop_log_indexes():
+    conn = get_conn()
+    for name in LOG_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+def db_init():
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS meta(
+      key TEXT PRIMARY KEY,
+      value REAL
+    )""")
+    # names live once in domains/tasks; everything else refers to them by integer id, and
+    # `*_key` (case-folded name) is what name lookups go through
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS domains(
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      name TEXT NOT NULL,
+      name_key TEXT NOT NULL UNIQUE
+    )""")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS tasks(
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      domain TEXT, task TEXT,
+      xp INTEGER DEFAULT 0,
+      streak INTEGER DEFAULT 0,
+      last_done DATE,
+      goal_min INTEGER,
+      difficulty REAL,
+      locked INTEGER DEFAULT 0,
+      domain_id INTEGER REFERENCES domains(id),
+      task_key TEXT
+    )""")
+    task_cols = {r[1] for r in cur.execute("PRAGMA table_info(tasks)")}
+    for col, typ in (("domain_id", "INTEGER REFERENCES domains(id)"), ("task_key", "TEXT")):
+        if col not in task_cols:
+            cur.execute(f"ALTER TABLE tasks ADD COLUMN {col} {typ}")
+    conn.commit()
+    # files from before the id schema: fill the keys, re-key logs in resumable chunks
+    from .migrate import migrate_schema
+    migrate_schema()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS logs(
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      ts TIMESTAMP, date DATE,
+      task_id INTEGER REFERENCES tasks(id),
+      domain_id INTEGER REFERENCES domains(id),
+      minutes INTEGER, xp_gain INTEGER, ratio REAL,
+      note TEXT,
+      goal_min INTEGER, difficulty REAL
+    )""")
+    # per-day aggregates of logs, kept current by the write path (dashboard and self-learning read these)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS daily_rollup(
+      date DATE, task_id INTEGER, domain_id INTEGER,
+      minutes INTEGER DEFAULT 0, xp INTEGER DEFAULT 0, count INTEGER DEFAULT 0,
+      ratio_sum REAL DEFAULT 0,
+      PRIMARY KEY(date, task_id)
+    )""")
+    # newest LEARN_WINDOW log ratios per task, newest first (comma-separated float reprs)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS learn_window(
+      task_id INTEGER PRIMARY KEY,
+      ratios TEXT
+    )""")
+    # every task's xp/streak/last_done after the last day of each month (see engine.state_as_of)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS xp_checkpoints(
+      date DATE, task_id INTEGER,
+      xp INTEGER, streak INTEGER, last_done DATE,
+      PRIMARY KEY(date, task_id)
+    )""")
+    # manifest of logs moved to compressed month files (see tracker.archive)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS archive_segments(
+      month TEXT PRIMARY KEY, file TEXT, version INTEGER, rows INTEGER,
+      first_id INTEGER, last_id INTEGER, first_date DATE, last_date DATE
+    )""")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_key ON tasks(domain_id, task_key)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_task_key ON tasks(task_key)")
+    create_log_indexes()
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_rollup_domain_date ON daily_rollup(domain_id, date)")
+    # Seed if empty
+    cur.execute("SELECT COUNT(*) FROM tasks")
+    if cur.fetchone()[0] == 0:
+        for d, tasks in DEFAULT_DOMAINS.items():
+            for t in tasks:
+                insert_task(d, t, DEFAULT_GOALS.get(t, 20), DEFAULT_DIFFICULTY.get(t, 2))
+        # lock those gated by UNLOCKS initially
+        gated = set(UNLOCKS.keys())
+        cur.execute("UPDATE tasks SET locked=1 WHERE task IN ({})".format(",".join("?"*len(gated))), tuple(gated))
+        # domain weights
+        for k, v in DEFAULT_WEIGHTS.items():
+            cur.execute("INSERT OR REPLACE INTO meta(key,value) VALUES(?,?)", (f"weight:{k}", float(v)))
+    conn.commit()
+    # databases created before daily_rollup / learn_window existed (or just migrated) get backfilled once
+    if conn.execute("SELECT 1 FROM meta WHERE key='rollup:built'").fetchone() is None:
+        rebuild_rollup()
+
+# ---------- catalog ----------
+def name_key(name) -> str:
+    """Case-folded lookup key of a domain or task name."""
+    return str(name).strip().casefold()
+
+def ensure_domain(name) -> int:
+    """Id of the domain called `name` (any case), creating it if needed."""
+    conn = get_conn()
+    key = name_key(name)
+    row = conn.execute("SELECT id FROM domains WHERE name_key=?", (key,)).fetchone()
+    if row is not None:
+        return row[0]
+    return conn.execute("INSERT INTO domains(name,name_key) VALUES(?,?)", (str(name).strip(), key)).lastrowid
+
+def insert_task(domain, task, goal_min=20, difficulty=2.0, locked=0) -> int:
+    """Add a task (and its domain if new); sqlite3.IntegrityError if the domain already has it."""
+    domain_id = ensure_domain(domain)
+    return get_conn().execute(
+        "INSERT INTO tasks(domain,domain_id,task,task_key,goal_min,difficulty,locked) "
+        "VALUES((SELECT name FROM domains WHERE id=?),?,?,?,?,?,?)",
+        (domain_id, domain_id, str(task).strip(), name_key(task), int(goal_min), float(difficulty), int(locked))).lastrowid
+
+def fetch_df(query, params=()):
+    import pandas as pd
+    conn = get_conn()
+    if not PROFILER.hooked:
+        return pd.read_sql_query(query, conn, params=params)
+    with PROFILER.timed(conn, query, params):   # pandas runs it on its own cursor
+        return pd.read_sql_query(query, conn, params=params)
+
+def fetch_rows(query, params=()) -> list:
+    conn = get_conn()
+    if not PROFILER.hooked:
+        return conn.execute(query, params).fetchall()
+    with PROFILER.timed(conn, query, params):   # timed through fetchall(), not just the first step
+        return conn.cursor().execute(query, params).fetchall()
+
+def execute(query, params=()):
+    conn = get_conn()
+    try:
+        cur = conn.execute(query, params)
+    except sqlite3.Error:
+        if not conn.tx_depth:   # don't leave the driver's implicit BEGIN open
+            conn.rollback()
+        raise
+    if not conn.tx_depth:
+        _bump_write_version(conn)
+        conn.commit()
+    return cur
+
+@contextmanager
+def transaction():
+    """Run every execute() inside the block as one atomic write with a single commit.
+
+    Re-entrant: nested blocks join the outermost transaction through a SAVEPOINT, so an
+    exception escaping an inner block undoes only that block's writes.
+    """
+    conn = get_conn()
+    sp = f"sp{conn.tx_depth}"
+    conn.execute(f"SAVEPOINT {sp}" if conn.tx_depth else "BEGIN IMMEDIATE")
+    conn.tx_depth += 1
+    try:
+        yield conn
+    except BaseException:
+        conn.tx_depth -= 1
+        if conn.tx_depth:
+            conn.execute(f"ROLLBACK TO {sp}")
+            conn.execute(f"RELEASE {sp}")
+        else:
+            conn.rollback()
+        raise
+    conn.tx_depth -= 1
+    if conn.tx_depth:
+        conn.execute(f"RELEASE {sp}")
+    else:
+        _bump_write_version(conn)
+        conn.commit()
+
+# ---------- write-versioned query cache ----------
+# meta['write_version'] goes up by one with every committed write (execute() or a
+# transaction() block). Cached reads are reused while the version is unchanged; commits
+# from other connections/processes are noticed through PRAGMA data_version, so an
+# unchanged database costs no table reads at all.
+CACHE_MAX_ENTRIES = 128
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+def _bump_write_version(conn):
+    conn.write_version = int(conn.execute(
+        "INSERT INTO meta(key,value) VALUES('write_version',1) "
+        "ON CONFLICT(key) DO UPDATE SET value=value+1 RETURNING value").fetchone()[0])
+
+def write_version() -> int:
+    conn = get_conn()
+    dv = conn.execute("PRAGMA data_version").fetchone()[0]
+    if conn.write_version is None or dv != conn.data_version:
+        row = conn.execute("SELECT value FROM meta WHERE key='write_version'").fetchone()
+        conn.write_version = int(row[0]) if row else 0
+        conn.data_version = dv
+    return conn.write_version
+
+class QueryCache:
+    """LRU of query results tagged with the write version they were read at."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evictions = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (version, value, nbytes)
+
+    def get_df(self, query, params=()):
+        """fetch_df() through the cache; callers get a private copy."""
+        return self._get("df", query, params, fetch_df,
+                         lambda df: int(df.memory_usage(index=True, deep=False).sum())).copy()
+
+    def get_rows(self, query, params=()):
+        """fetch_rows() through the cache; callers get a private list of row tuples."""
+        return list(self._get("rows", query, params, fetch_rows, lambda rows: 64 * (len(rows) + 1)))
+
+    def _get(self, kind, query, params, load, size_of):
+        if get_conn().tx_depth:   # uncommitted writes are only visible to this connection
+            return load(query, params)
+        version = write_version()
+        key = (current_user(), kind, query, tuple(params))
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and hit[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+            self.misses += 1
+        value = load(query, params)
+        nbytes = size_of(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            if nbytes <= self.max_bytes:
+                self._entries[key] = (version, value, nbytes)
+                self._bytes += nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, b) = self._entries.popitem(last=False)
+                self._bytes -= b
+                self.evictions += 1
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / total if total else 0.0,
+                    "entries": len(self._entries), "bytes": self._bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+QUERY_CACHE = QueryCache()
+
+def cached_df(query, params=()):
+    """fetch_df() served from QUERY_CACHE until the next committed write."""
+    return QUERY_CACHE.get_df(query, params)
+
+def cached_rows(query, params=()):
+    """fetch_rows() served from QUERY_CACHE until the next committed write."""
+    return QUERY_CACHE.get_rows(query, params)
+
+# ---------- daily rollups ----------
+_ROLLUP_UPSERT = """
+    INSERT INTO daily_rollup(date,task_id,domain_id,minutes,xp,count,ratio_sum) VALUES(?,?,?,?,?,?,?)
+    ON CONFLICT(date,task_id) DO UPDATE SET
+      minutes=minutes+excluded.minutes, xp=xp+excluded.xp, count=count+excluded.count,
+      ratio_sum=ratio_sum+excluded.ratio_sum"""
+
+def rollup_add(rows):
+    """Fold (date, task_id, domain_id, minutes, xp, count, ratio_sum) deltas into daily_rollup."""
+    get_conn().executemany(_ROLLUP_UPSERT, rows)
+
+def learn_window(task_id) -> list:
+    """The task's newest LEARN_WINDOW log ratios, newest first."""
+    row = get_conn().execute("SELECT ratios FROM learn_window WHERE task_id=?", (task_id,)).fetchone()
+    return [float(r) for r in row[0].split(",")] if row and row[0] else []
+
+def learn_window_push(task_id, ratios):
+    """Put newly logged ratios (newest first) in front of the task's window."""
+    window = (list(ratios) + learn_window(task_id))[:LEARN_WINDOW]
+    get_conn().execute("INSERT INTO learn_window(task_id,ratios) VALUES(?,?) "
+                       "ON CONFLICT(task_id) DO UPDATE SET ratios=excluded.ratios",
+                       (task_id, ",".join(repr(float(r)) for r in window)))
+
+def rebuild_rollup(task_id=None):
+    """Recompute daily_rollup and learn_window from logs (hot and archived) — everything, or only one task."""
+    where, params = ("WHERE task_id=?", (task_id,)) if task_id is not None else ("", ())
+    with transaction() as conn:
+        execute(f"DELETE FROM daily_rollup {where}", params)
+        execute(f"""INSERT INTO daily_rollup(date,task_id,domain_id,minutes,xp,count,ratio_sum)
+                    SELECT date, task_id, domain_id, SUM(minutes), SUM(xp_gain), COUNT(*), SUM(ratio) FROM logs {where}
+                    GROUP BY date, task_id""", params)
+        execute(f"DELETE FROM learn_window {where}", params)
+        windows = {}
+        for t, i, r in conn.execute(f"""SELECT task_id, id, ratio FROM (
+                                       SELECT task_id, id, ratio, ROW_NUMBER() OVER (PARTITION BY task_id ORDER BY id DESC) AS rn
+                                       FROM logs {where}) WHERE rn <= ? ORDER BY task_id, rn""", params + (LEARN_WINDOW,)):
+            windows.setdefault(t, []).append((i, r))
+        if conn.execute("SELECT 1 FROM archive_segments LIMIT 1").fetchone():
+            from . import archive
+            rollup_add(archive.rollup_rows(task_id))
+            for t, cold in archive.recent_ratios(LEARN_WINDOW, task_id).items():
+                windows[t] = sorted(windows.get(t, []) + cold, reverse=True)[:LEARN_WINDOW]
+        conn.executemany("INSERT INTO learn_window(task_id,ratios) VALUES(?,?)",
+                         ((t, ",".join(repr(float(r)) for _, r in w)) for t, w in windows.items()))
+        if task_id is None:
+            execute("INSERT OR REPLACE INTO meta(key,value) VALUES('rollup:built', 1)")
@@ -0,0 +1,186 @@
+"""Opt-in query and rerun profiling.
+
+Off by default: every connection-level execute then costs one attribute check. When
+enabled, each statement's wall time is recorded per distinct SQL text, per rerun and per
+phase of a rerun (sidebar, the page branch, ...), the slowest statements are kept, and
+with `explain` on, EXPLAIN QUERY PLAN is captured once for every distinct SELECT.
+
+`enabled`/`explain` are process-wide (TRACKER_PROFILE, the CLI's --profile). A UI session
+passes its own toggles to begin_rerun() instead, so they only cover that session's reruns.
+
+    from tracker import PROFILER
+    PROFILER.begin_rerun(enabled=True); PROFILER.phase("Dashboard"); ...; PROFILER.end_rerun()
+    PROFILER.report()   # JSON-ready dict
+"""
+import contextvars
+import datetime as dt
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+MAX_RERUNS = 50
+MAX_STATEMENTS = 500
+MAX_SLOWEST = 25
+SQL_PREVIEW = 2000
+
+_RERUN = contextvars.ContextVar("tracker_rerun", default=None)
+
+def _clean(sql) -> str:
+    return " ".join(sql.split())[:SQL_PREVIEW]
+
+class Profiler:
+    """Collects statement timings; module-level PROFILER is the one the DB layer reports to."""
+
+    def __init__(self, enabled=False, explain=False):
+        self.enabled = enabled
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._live = 0   # reruns being profiled right now, in any context
+        self._clear()
+
+    @property
+    def hooked(self) -> bool:
+        """Whether statements should be timed at all (the connection-level check)."""
+        return self.enabled or self._live > 0
+
+    def reset(self):
+        """Drop everything collected so far, including this context's unfinished rerun."""
+        self.end_rerun(interrupted=True)   # keeps _live balanced, so hooked can turn off again
+        self._clear()
+
+    def _clear(self):
+        with self._lock:
+            self.reruns = deque(maxlen=MAX_RERUNS)
+            self.statements = {}   # cleaned sql -> {"count", "total_ms", "max_ms", "plan"}
+            self._slowest = []     # min-heap of (ms, seq, entry)
+            self._seq = itertools.count()
+
+    # ----- reruns and phases -----
+    def begin_rerun(self, label=None, enabled=None, explain=None):
+        """Start attributing this context's queries to a new rerun (closing any unfinished one).
+
+        `enabled`/`explain` apply to this rerun only; None means the process-wide setting.
+        """
+        self.end_rerun(interrupted=True)
+        if not (self.enabled if enabled is None else enabled):
+            return None
+        now = time.perf_counter()
+        run = {"id": next(self._ids), "label": label, "started": dt.datetime.now(dt.timezone.utc).isoformat(),
+               "total_ms": 0.0, "queries": 0, "query_ms": 0.0, "interrupted": False,
+               "phases": {}, "_t0": now, "_phase": None, "_phase_t0": now,
+               "_explain": self.explain if explain is None else explain}
+        with self._lock:
+            self._live += 1
+        _RERUN.set(run)
+        return run
+
+    def phase(self, name):
+        """Close the running phase and time what follows as `name`."""
+        run = _RERUN.get()
+        if run is None:
+            return
+        now = time.perf_counter()
+        self._close_phase(run, now)
+        run["_phase"], run["_phase_t0"] = name, now
+        run["phases"].setdefault(name, {"ms": 0.0, "queries": 0, "query_ms": 0.0})
+
+    def end_rerun(self, interrupted=False):
+        run = _RERUN.get()
+        if run is None:
+            return None
+        _RERUN.set(None)
+        now = time.perf_counter()
+        self._close_phase(run, now)
+        run["total_ms"] = round((now - run.pop("_t0")) * 1000, 3)
+        run["query_ms"] = round(run["query_ms"], 3)
+        run["interrupted"] = interrupted
+        run.pop("_phase"); run.pop("_phase_t0"); run.pop("_explain")
+        with self._lock:
+            self._live -= 1
+            self.reruns.append(run)
+        return run
+
+    @staticmethod
+    def _close_phase(run, now):
+        if run["_phase"] is not None:
+            ph = run["phases"][run["_phase"]]
+            ph["ms"] = round(ph["ms"] + (now - run["_phase_t0"]) * 1000, 3)
+
+    # ----- statements -----
+    @contextmanager
+    def timed(self, conn, sql, params=()):
+        """Time the block as one execution of `sql` (used where the driver bypasses conn.execute)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(conn, sql, params, time.perf_counter() - t0)
+
+    def record(self, conn, sql, params, seconds, many=False):
+        run = _RERUN.get()
+        if run is None and not self.enabled:
+            return   # another session is profiling, this context is not
+        ms = seconds * 1000
+        key = _clean(sql)
+        if run is not None:
+            run["queries"] += 1
+            run["query_ms"] += ms
+            if run["_phase"] is not None:
+                ph = run["phases"][run["_phase"]]
+                ph["queries"] += 1
+                ph["query_ms"] = round(ph["query_ms"] + ms, 3)
+        need_plan = False
+        with self._lock:
+            st = self.statements.get(key)
+            if st is None and len(self.statements) < MAX_STATEMENTS:
+                st = self.statements[key] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "plan": None}
+            if st is not None:
+                explain = run["_explain"] if run is not None else self.explain
+                need_plan = explain and not many and st["plan"] is None
+                st["count"] += 1
+                st["total_ms"] += ms
+                st["max_ms"] = max(st["max_ms"], ms)
+            entry = (round(ms, 3), next(self._seq),
+                     {"ms": round(ms, 3), "sql": key, "params": None if many else repr(params)[:200],
+                      "executemany": many, "phase": run and run["_phase"], "rerun": run and run["id"]})
+            if len(self._slowest) < MAX_SLOWEST:
+                heapq.heappush(self._slowest, entry)
+            elif entry[0] > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+        if need_plan:
+            st["plan"] = self._plan(conn, sql, params)
+
+    @staticmethod
+    def _plan(conn, sql, params):
+        if not sql.lstrip()[:6].upper().startswith(("SELECT", "WITH")):
+            return []
+        try:   # unbound base-class execute, so the EXPLAIN itself is not recorded
+            return [r[-1] for r in sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params)]
+        except sqlite3.Error as e:
+            return [f"(no plan: {e})"]
+
+    # ----- output -----
+    def report(self) -> dict:
+        with self._lock:
+            statements = sorted(
+                ({"sql": k, "count": v["count"], "total_ms": round(v["total_ms"], 3),
+                  "mean_ms": round(v["total_ms"] / v["count"], 3), "max_ms": round(v["max_ms"], 3),
+                  "plan": v["plan"]} for k, v in self.statements.items()),
+                key=lambda s: s["total_ms"], reverse=True)
+            return {"enabled": self.enabled, "explain": self.explain,
+                    "generated": dt.datetime.now(dt.timezone.utc).isoformat(),
+                    "reruns": list(self.reruns), "statements": statements,
+                    "slowest": [e for _, _, e in sorted(self._slowest, reverse=True)]}
+
+    def to_json(self, **extra) -> str:
+        return json.dumps({**self.report(), **extra}, indent=2, default=str)
+
+PROFILER = Profiler(enabled=os.environ.get("TRACKER_PROFILE", "") not in ("", "0"),
+                    explain=os.environ.get("TRACKER_PROFILE_EXPLAIN", "") not in ("", "0"))
@@ -0,0 +1,819 @@
+"""Tracker business logic: XP, streaks, decay, unlocks, self-learning, import and recommender.
+
+Importing this module has no UI side effects; numpy/pandas are only imported by the
+bulk/analytics helpers that need them.
+"""
+import datetime as dt
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from .config import (BASE_XP, DEFAULT_GOALS, DEFAULT_WEIGHTS, LEARN_WINDOW, LEVELS, RECOMMENDER,
+                     STREAK_MILESTONES, TREND_POINTS, UNLOCKS)
+from . import archive
+from .db import (cached_df, cached_rows, create_log_indexes, drop_log_indexes, execute, fetch_df, fetch_rows, get_conn,
+                 learn_window, learn_window_push, name_key, rebuild_rollup, rollup_add, transaction)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+def get_level(xp:int) -> str:
+    for name, lo, hi in LEVELS:
+        if lo <= xp <= hi:
+            return name
+    return "Top 1%"
+
+def get_domain_weights():
+    rows = cached_rows("SELECT key,value FROM meta WHERE key LIKE 'weight:%'")
+    if not rows:
+        return DEFAULT_WEIGHTS.copy()
+    return {k.split(":",1)[1]: float(v) for k, v in rows}
+
+def set_domain_weight(domain, value):
+    execute("INSERT OR REPLACE INTO meta(key,value) VALUES(?,?)", (f"weight:{domain}", float(value)))
+
+def set_goal(task, minutes):
+    execute("UPDATE tasks SET goal_min=? WHERE task_key=?", (int(minutes), name_key(task)))
+
+# ---------- unlock engine ----------
+# UNLOCKS is compiled once into a prerequisite graph {prereq task: [rules gated on it]}, so a
+# log only re-checks the tasks that depend on the task just logged.
+_UNLOCK_RE = re.compile(
+    r"SELECT\s+(SUM|MAX)\((xp|streak)\)\s+FROM\s+tasks\s+WHERE\s+task='([^']+)'\s+AND\s+(xp|streak)\s*>=\s*(\d+)",
+    re.IGNORECASE)
+
+class UnlockRule(NamedTuple):
+    task: str        # gated task
+    prereq: str      # task whose progress opens it
+    agg: str         # "SUM" (of xp) or "MAX" (of streak)
+    metric: str      # tasks column: "xp" or "streak"
+    threshold: int
+
+def compile_unlocks(unlocks) -> dict:
+    graph = {}
+    for task, cond_sql in unlocks.items():
+        m = _UNLOCK_RE.fullmatch(cond_sql.strip())
+        if not m or m.group(2).lower() != m.group(4).lower():
+            raise ValueError(f"Unsupported unlock rule for {task!r}: {cond_sql}")
+        rule = UnlockRule(task, m.group(3), m.group(1).upper(), m.group(2).lower(), int(m.group(5)))
+        graph.setdefault(rule.prereq, []).append(rule)
+    return graph
+
+UNLOCK_GRAPH = compile_unlocks(UNLOCKS)
+UNLOCK_RULES = {r.task: r for rules in UNLOCK_GRAPH.values() for r in rules}
+
+def _rule_met(rule, values) -> bool:
+    # Same truth value as the original SQL: SUM/MAX over prerequisite rows that pass the
+    # threshold is non-NULL iff at least one row passes it.
+    return any(v is not None and v >= rule.threshold for v in values)
+
+def _prereq_values(prereqs) -> dict:
+    prereqs = tuple(prereqs)
+    rows = get_conn().execute(
+        "SELECT task, xp, streak FROM tasks WHERE task IN ({})".format(",".join("?"*len(prereqs))), prereqs)
+    vals = {}
+    for t, xp, streak in rows:
+        vals.setdefault(t, []).append({"xp": xp, "streak": streak})
+    return vals
+
+def _apply_unlocks(rules, vals=None) -> list:
+    """Unlock every task whose rule is met; only rows that are actually locked get written.
+
+    `vals` ({prereq: [{"xp": .., "streak": ..}]}) overrides the current task rows.
+    """
+    if not rules: return []
+    if vals is None:
+        vals = _prereq_values({r.prereq for r in rules})
+    met = [r.task for r in rules if _rule_met(r, [v[r.metric] for v in vals.get(r.prereq, [])])]
+    if not met: return []
+    marks = ",".join("?"*len(met))
+    flipped = [t for (t,) in get_conn().execute(
+        f"SELECT DISTINCT task FROM tasks WHERE locked=1 AND task IN ({marks})", tuple(met))]
+    if flipped:
+        execute(f"UPDATE tasks SET locked=0 WHERE locked=1 AND task IN ({','.join('?' * len(flipped))})", tuple(flipped))
+    return flipped
+
+def is_unlocked(task) -> bool:
+    rule = UNLOCK_RULES.get(task)
+    if rule is None:  # not gated
+        return True
+    return _rule_met(rule, [v[rule.metric] for v in _prereq_values([rule.prereq]).get(rule.prereq, [])])
+
+def maybe_unlock_dependents(task) -> list:
+    """Re-evaluate only the tasks gated on `task`; returns the names that were unlocked."""
+    return _apply_unlocks(UNLOCK_GRAPH.get(task, []))
+
+def maybe_unlock_all() -> list:
+    return _apply_unlocks(list(UNLOCK_RULES.values()))
+
+def calc_decay(last_done, today=None):
+    if not last_done:
+        return 1.0
+    today = today or dt.date.today()
+    idle = (today - dt.datetime.strptime(last_done, "%Y-%m-%d").date()).days
+    if idle <= 3: return 1.0
+    return max(0.80, 1.0 - 0.01*(idle-3))  # cap −20%
+
+def xp_gain_for(task:str, minutes:int, goal:int, diff:float, current_streak:int, met_goal:bool) -> int:
+    base = BASE_XP["daily"]
+    ratio_bonus = min(1.5, max(0.2, minutes/goal))
+    streak_bonus = 1 + min(0.30, current_streak*0.03)
+    diff_bonus = 1 + (float(diff)-1)*0.25
+    xp = round(base * ratio_bonus * streak_bonus * diff_bonus)
+    if met_goal and current_streak in STREAK_MILESTONES: xp += BASE_XP["weekly"]
+    return int(xp)
+
+def log_progress(domain, task, minutes, note="", day=None, learn=True):
+    """Log `minutes` to a task. `day` (date or ISO string) defaults to today;
+    `learn=False` skips self-learning, e.g. when replaying history."""
+    with transaction():
+        _log_progress(domain, task, minutes, note, day, learn)
+
+def log_progress_many(entries):
+    """Apply many logs in one transaction (one commit for the whole burst).
+
+    `entries` holds (domain, task, minutes[, note[, day]]) tuples or dicts with those keys.
+    Returns the number of entries applied.
+    """
+    n = 0
+    with transaction():
+        for e in entries:
+            if isinstance(e, dict):
+                _log_progress(e["domain"], e["task"], e["minutes"], e.get("note", ""), e.get("day"))
+            else:
+                _log_progress(*e)
+            n += 1
+    return n
+
+def _log_progress(domain, task, minutes, note="", day=None, learn=True):
+    # read current
+    row = get_conn().execute(
+        "SELECT t.id, t.domain_id, t.task, t.xp, t.streak, t.last_done, t.goal_min, t.difficulty "
+        "FROM domains d JOIN tasks t ON t.domain_id = d.id WHERE d.name_key=? AND t.task_key=?",
+        (name_key(domain), name_key(task))).fetchone()
+    if row is None:
+        raise ValueError(f"Unknown task {domain} → {task}")
+    task_id, domain_id, task, xp, streak, last, goal, diff = row
+    day = dt.date.fromisoformat(day) if isinstance(day, str) else (day or dt.date.today())
+    today = day.isoformat()
+    # streak math
+    if last == today:
+        current_streak = streak  # multiple logs same day keep streak
+    elif last == (day - dt.timedelta(days=1)).isoformat():
+        current_streak = streak + 1
+    else:
+        current_streak = 1
+    goal = int(goal); diff = float(diff)
+    ratio = minutes/goal if goal>0 else 1.0
+    backdated = last is not None and today < last
+    if not backdated:
+        met_goal = minutes >= goal
+        gain = xp_gain_for(task, minutes, goal, diff, current_streak, met_goal)
+        # decay then add
+        decay = calc_decay(last, day) if last else 1.0
+        new_xp = int(round(int(xp)*decay) + gain)
+        execute("UPDATE tasks SET xp=?, streak=?, last_done=? WHERE id=?",
+                (new_xp, current_streak, today, task_id))
+    cur = execute("INSERT INTO logs(ts,date,task_id,domain_id,minutes,xp_gain,ratio,note,goal_min,difficulty) "
+                  "VALUES(?,?,?,?,?,?,?,?,?,?)",
+                  (dt.datetime.now(dt.timezone.utc).isoformat(), today, task_id, domain_id, int(minutes),
+                   None if backdated else int(gain), float(ratio), note, goal, diff))
+    if backdated:   # before the task's last log: score it on its day and replay the later logs
+        gain = _rescore([task_id], today)[cur.lastrowid]
+    rollup_add([(today, task_id, domain_id, int(minutes), int(gain), 1, float(ratio))])
+    learn_window_push(task_id, [ratio])
+    _checkpoints_after_write(today)
+    # attempt unlocks (only tasks gated on this one can change)
+    maybe_unlock_dependents(task)
+    # self-learning updates (lightweight)
+    if learn:
+        self_learning_adjustments(task, task_id)
+
+def self_learning_adjustments(task_name:str, task_id=None):
+    """
+    - If last 5 ratios for task >1.2 → raise goal by +10% (max +50% above default)
+    - If last 5 ratios for task <0.6 → lower goal by -10% (min -40% below default)
+    - If you frequently miss a domain (avg ratio <0.7 over 7 days) → boost domain weight slightly
+    - Difficulty nudges: if ratio consistently >1.3, downshift difficulty by 0.1; if <0.5, upshift by 0.1 (clamp 1..3)
+
+    Reads only the rolling stats kept by the write path (learn_window, daily_rollup ratio sums),
+    so the cost does not grow with history; only values that change are written back.
+    `task_id` picks the task when several domains have one called `task_name`.
+    """
+    conn = get_conn()
+    where, key = ("id=?", task_id) if task_id is not None else ("task_key=?", name_key(task_name))
+    row = conn.execute(f"SELECT id, task, goal_min, difficulty FROM tasks WHERE {where}", (key,)).fetchone()
+    ratios = learn_window(row[0]) if row else []
+    if len(ratios) >= 3:
+        avg = sum(ratios) / len(ratios)
+        task_id, task_name, cur_goal, diff = row
+        cur_goal, diff = int(cur_goal), float(diff)
+        # adjust goal
+        base = DEFAULT_GOALS.get(task_name, 20)
+        goal = cur_goal
+        if avg > 1.2 and cur_goal < int(base*1.5):
+            goal = int(round(cur_goal*1.10))
+        elif avg < 0.6 and cur_goal > int(base*0.6):
+            goal = max(5, int(round(cur_goal*0.90)))
+        if goal != cur_goal:
+            execute("UPDATE tasks SET goal_min=? WHERE id=?", (goal, task_id))
+        # difficulty nudge
+        new_diff = diff
+        if avg > 1.3 and diff > 1.0:
+            new_diff = round(max(1.0, diff-0.1), 2)
+        elif avg < 0.5 and diff < 3.0:
+            new_diff = round(min(3.0, diff+0.1), 2)
+        if new_diff != diff:
+            execute("UPDATE tasks SET difficulty=? WHERE id=?", (new_diff, task_id))
+
+    # domain weight weekly tuning (at most 8 days x tasks rollup rows); `+domain_id` keeps the
+    # planner on the date range instead of scanning idx_rollup_domain_date to group by domain
+    last7 = conn.execute("""
+        SELECT d.name, r.avg_ratio FROM (
+          SELECT domain_id, SUM(ratio_sum) / SUM(count) AS avg_ratio
+          FROM daily_rollup WHERE date >= ?
+          GROUP BY +domain_id) r
+        JOIN domains d ON d.id = r.domain_id
+    """, ((dt.date.today()-dt.timedelta(days=7)).isoformat(),)).fetchall()
+    if last7:
+        weights = get_domain_weights()
+        for dom, avg_r in last7:
+            avg_r = float(avg_r)
+            if dom not in weights: continue
+            w = weights[dom]
+            if avg_r < 0.70: w = min(0.50, w+0.02)
+            elif avg_r > 1.10: w = max(0.10, w-0.02)
+            if w != weights[dom]:
+                set_domain_weight(dom, w)
+
+# ---------- bulk import / export ----------
+IMPORT_COLUMNS = ("date", "domain", "task", "minutes")
+
+def read_log_file(src, name=None) -> "pd.DataFrame":
+    """Read a CSV or JSONL log export (path or file-like; `name` gives the suffix for uploads)."""
+    import pandas as pd
+    suffix = Path(name or str(src)).suffix.lower()
+    if suffix in (".jsonl", ".ndjson", ".json"):
+        return pd.read_json(src, lines=True, dtype=False)
+    return pd.read_csv(src, dtype={"note": str, "ts": str}, keep_default_na=False)
+
+def _replay(keys, days, minutes, goal, diff, xp0, streak0, last0, gain=None):
+    """Streak, XP gain and XP after every event, for events sorted by (task key, day).
+
+    `days` are int64 day numbers; xp0/streak0/last0 (datetime64[D], NaT = never) hold the
+    task's state before its first event and are only read on each task's first row. `gain`
+    defaults to what xp_gain_for() awards for minutes/goal/diff; given, its negative entries
+    (logs not scored yet) are computed that way. Same float operations as log_progress().
+    """
+    import numpy as np
+    n = len(days)
+    # previous log day: the row before in the same task, or the task's stored last_done
+    first = np.ones(n, dtype=bool); first[1:] = keys[1:] != keys[:-1]
+    starts = np.flatnonzero(first)
+    prev = np.empty(n, dtype=np.int64); prev[1:] = days[:-1]
+    has_prev = ~first | ~np.isnat(last0)
+    prev[first] = last0[first].astype(np.int64)
+    gap = np.where(has_prev, days - prev, 0)
+
+    # streak: same day keeps it, next day +1, anything else (or no history) restarts at 1
+    restart = ~has_prev | ((gap != 0) & (gap != 1))
+    seg_start = restart | first
+    base = np.where(restart, 1, (gap == 1).astype(np.int64))
+    base[first & ~restart] += streak0[first & ~restart]
+    csum = np.cumsum(base)
+    seg_idx = np.flatnonzero(seg_start)
+    streak = csum - (csum - base)[seg_idx][np.cumsum(seg_start) - 1]
+
+    # xp_gain_for / calc_decay, vectorized with the same float operations
+    if gain is None or (gain < 0).any():
+        ratio_bonus = np.clip(minutes / goal, 0.2, 1.5)
+        streak_bonus = 1 + np.minimum(0.30, streak * 0.03)
+        diff_bonus = 1 + (diff - 1) * 0.25
+        scored = np.rint(BASE_XP["daily"] * ratio_bonus * streak_bonus * diff_bonus).astype(np.int64)
+        scored += np.where((minutes >= goal) & np.isin(streak, STREAK_MILESTONES), BASE_XP["weekly"], 0)
+        gain = scored if gain is None else np.where(gain < 0, scored, gain)
+    decay = np.where(has_prev & (gap > 3), np.maximum(0.80, 1.0 - 0.01 * (gap - 3)), 1.0)
+
+    # xp_new = round(xp_old*decay) + gain is linear between decay points: add gains with a
+    # prefix sum and only step through the rows where decay < 1.
+    gsum = np.concatenate(([0], np.cumsum(gain)))
+    ends = np.append(starts[1:], n)
+    cuts = np.flatnonzero(decay < 1.0)
+    xp = np.empty(n, dtype=np.int64)
+    for s, e in zip(starts.tolist(), ends.tolist()):
+        bounds = [s] + cuts[(cuts > s) & (cuts < e)].tolist() + [e]
+        x = int(xp0[s])
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            xp[a:b] = int(round(x * float(decay[a]))) - int(gsum[a]) + gsum[a + 1:b + 1]
+            x = int(xp[b - 1])
+    return streak, gain, xp
+
+def import_logs(logs: "pd.DataFrame") -> dict:
+    """Bulk-replay historical logs (columns date, domain, task, minutes[, note, ts]).
+
+    Logs are stably sorted per task by date, and streaks, decay and XP gains are computed
+    with array operations; `logs` rows and final `tasks` state are written with executemany
+    in one transaction. The result equals calling
+    `log_progress(domain, task, minutes, note, day=date, learn=False)` row by row in that
+    order: goals and difficulty stay at their current values (self-learning is not replayed),
+    and a gated task unlocks if its prerequisite crossed the threshold at any point. Tasks
+    whose imported logs start before their last_done are merged into their timeline by
+    date, as a backdated log_progress() is (see _rescore).
+    """
+    import numpy as np
+    import pandas as pd
+    missing = [c for c in IMPORT_COLUMNS if c not in logs.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    if logs.empty:
+        return {"rows": 0, "tasks": 0, "unlocked": []}
+    logs = logs[[c for c in logs.columns if c in IMPORT_COLUMNS + ("note", "ts")]]   # e.g. export_logs() output
+    tasks = fetch_df("SELECT id, domain_id, domain, task, xp, streak, last_done, goal_min, difficulty FROM tasks")
+    df = logs.reset_index(drop=True).merge(tasks, on=["domain", "task"], how="left", validate="many_to_one")
+    unknown = df.loc[df["id"].isna(), ["domain", "task"]].drop_duplicates()
+    if not unknown.empty:
+        raise ValueError("Unknown tasks: " + ", ".join(f"{d} → {t}" for d, t in unknown.itertuples(index=False)))
+
+    days = pd.to_datetime(df["date"], format="ISO8601").to_numpy().astype("datetime64[D]")
+    order = np.lexsort((np.arange(len(df)), days, df["id"].to_numpy()))
+    df = df.iloc[order].reset_index(drop=True)
+    days = days[order].astype(np.int64)
+    task_ids = df["id"].to_numpy(np.int64)
+    domain_ids = df["domain_id"].to_numpy(np.int64)
+    minutes = df["minutes"].to_numpy(np.int64)
+    goal = df["goal_min"].to_numpy(np.int64)
+    diff = df["difficulty"].to_numpy(np.float64)
+    n = len(df)
+    streak, gain, xp = _replay(task_ids, days, minutes, goal, diff, df["xp"].to_numpy(np.int64),
+                               df["streak"].to_numpy(np.int64),
+                               pd.to_datetime(df["last_done"], format="ISO8601").to_numpy().astype("datetime64[D]"))
+    first = np.ones(n, dtype=bool); first[1:] = task_ids[1:] != task_ids[:-1]
+    starts = np.flatnonzero(first)
+    last = np.append(starts[1:], n) - 1
+    # tasks with logs older than their last_done: inserted unscored, then merged by _rescore
+    last_done = pd.to_datetime(df["last_done"], format="ISO8601").to_numpy().astype("datetime64[D]")[starts]
+    merge = ~np.isnat(last_done) & (days[starts] < last_done.astype(np.int64))
+    merged_rows = np.repeat(merge, np.diff(np.append(starts, n)))
+
+    date_str = np.datetime_as_string(days.astype("datetime64[D]"), unit="D")
+    ratio = np.where(goal > 0, minutes / np.where(goal > 0, goal, 1), 1.0)
+    note = df["note"].fillna("").astype(str) if "note" in df else pd.Series("", index=df.index)
+    ts = pd.Series(date_str).add("T00:00:00+00:00")
+    if "ts" in df:
+        ts = df["ts"].where(df["ts"].notna() & (df["ts"].astype(str) != ""), ts)
+    log_rows = zip(ts.tolist(), date_str.tolist(), task_ids.tolist(), domain_ids.tolist(),
+                   minutes.tolist(), np.where(merged_rows, None, gain).tolist(), ratio.tolist(), note.tolist(),
+                   goal.tolist(), diff.tolist())
+    task_rows = zip(xp[last][~merge].tolist(), streak[last][~merge].tolist(), date_str[last][~merge].tolist(),
+                    task_ids[starts][~merge].tolist())
+
+    names = df["task"].to_numpy()[starts].tolist()
+    peaks = {}
+    for t, px, ps, m in zip(names, np.maximum.reduceat(xp, starts).tolist(), np.maximum.reduceat(streak, starts).tolist(),
+                            merge.tolist()):
+        if not m:
+            peaks.setdefault(t, []).append({"xp": px, "streak": ps})
+    first_day = str(np.datetime64(int(days.min()), "D"))
+    with transaction() as conn:
+        seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='logs'").fetchone()
+        seq = seq[0] if seq else 0
+        ids = seq + 1 + np.arange(n)   # AUTOINCREMENT: this insert's ids run on from the sequence in row order
+        if not merge.any():
+            # checkpoints get rebuilt from the logs after the newest one kept: the stored ones are
+            # read now, the imported ones come from the replay instead of a read-back
+            cp = conn.execute("SELECT MAX(date) FROM xp_checkpoints WHERE date < ?", (first_day,)).fetchone()[0]
+            since_cp = _events(cp)
+        if n >= seq:   # at least doubles the table: build logs' indexes once instead of row by row
+            drop_log_indexes()
+        conn.executemany("INSERT INTO logs(ts,date,task_id,domain_id,minutes,xp_gain,ratio,note,goal_min,difficulty) "
+                         "VALUES(?,?,?,?,?,?,?,?,?,?)", log_rows)
+        create_log_indexes()
+        conn.executemany("UPDATE tasks SET xp=?, streak=?, last_done=? WHERE id=?", task_rows)
+        if merge.any():
+            merged_peaks = {}
+            scored = _rescore(task_ids[starts][merge].tolist(), min(date_str[starts][merge].tolist()), merged_peaks)
+            gain[merged_rows] = [scored[i] for i in ids[merged_rows].tolist()]
+            task_names = dict(zip(task_ids[starts].tolist(), names))
+            for t, p in merged_peaks.items():
+                peaks.setdefault(task_names[t], []).append(p)
+        daily = (pd.DataFrame({"date": date_str, "task_id": task_ids, "domain_id": domain_ids, "minutes": minutes,
+                               "xp": gain, "ratio": ratio})
+                 .groupby(["date", "task_id", "domain_id"], sort=False)
+                 .agg(minutes=("minutes", "sum"), xp=("xp", "sum"), count=("xp", "size"), ratio_sum=("ratio", "sum"))
+                 .reset_index())
+        rollup_add(daily.itertuples(index=False, name=None))
+        # rows went in in df order, so each task's newest ratios are its last rows
+        recent = pd.DataFrame({"task_id": task_ids, "ratio": ratio}).groupby("task_id", sort=False).tail(LEARN_WINDOW)
+        for t, r in recent.groupby("task_id", sort=False)["ratio"]:
+            learn_window_push(int(t), r.tolist()[::-1])
+        if merge.any():
+            _checkpoints_after_write(first_day)
+        else:
+            new = pd.DataFrame({"id": ids, "date": date_str, "task_id": task_ids, "xp_gain": gain})
+            _checkpoints_after_write(first_day, new if since_cp.empty else pd.concat([since_cp, new], ignore_index=True))
+        unlocked = _apply_unlocks([r for t in peaks for r in UNLOCK_GRAPH.get(t, [])], peaks)
+    return {"rows": n, "tasks": len(starts), "unlocked": unlocked}
+
+EXPORT_COLUMNS = ("id", "ts", "date", "domain", "task", "minutes", "xp_gain", "ratio", "note")
+
+def export_logs(fmt="csv", chunk_rows=10_000):
+    """Yield every log as CSV or JSONL text, `chunk_rows` rows per chunk: archived months
+    oldest first, then the hot table by id.
+
+    Memory stays at one archived month plus one chunk however long the history is; the
+    output reads back with read_log_file()/import_logs(). Don't run archive_logs() meanwhile.
+    """
+    import csv
+    import io
+    import json
+    import numpy as np
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Unknown export format {fmt!r}")
+    names = {i: (d, t) for i, d, t in fetch_rows("SELECT id, domain, task FROM tasks")}
+
+    def render(rows):
+        if fmt == "jsonl":
+            return "".join(json.dumps(dict(zip(EXPORT_COLUMNS, r)), ensure_ascii=False) + "\n" for r in rows)
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerows(rows)
+        return buf.getvalue()
+
+    if fmt == "csv":
+        yield render([EXPORT_COLUMNS])
+    for month in archive.iter_months():
+        dates = np.datetime_as_string(month["date"].astype("datetime64[D]"), unit="D")
+        for a in range(0, len(dates), chunk_rows):
+            cols = [month[c][a:a + chunk_rows].tolist() for c in ("id", "ts", "task_id", "minutes", "xp_gain", "ratio", "note")]
+            yield render((i, ts, d, *names.get(t, ("", "")), m, x, r, n)
+                         for i, ts, d, t, m, x, r, n in zip(*cols[:2], dates[a:a + chunk_rows].tolist(), *cols[2:]))
+    last = 0
+    while True:
+        rows = fetch_rows("SELECT id, ts, date, task_id, minutes, xp_gain, ratio, note FROM logs"
+                          " WHERE id > ? ORDER BY id LIMIT ?", (last, int(chunk_rows)))
+        if not rows:
+            break
+        last = rows[-1][0]
+        yield render((i, ts, d, *names.get(t, ("", "")), m, x, r, n) for i, ts, d, t, m, x, r, n in rows)
+
+# ---------- event-sourced state: checkpoints, as-of, recompute ----------
+# `logs` is the event source: a task's xp/streak/last_done is its events replayed in
+# (date, id) order. xp_checkpoints stores every task's state after the last day of each
+# month, so "as of day X" restores the newest checkpoint on or before X and replays only
+# the logs after it. The write path keeps checkpoints current (dropping any a backdated
+# log invalidates) up to the month before the newest log.
+_STATE_COLS = ["task_id", "xp", "streak", "last_done"]
+
+def _month_ends(first, last) -> list:
+    """ISO dates of the month ends m with first <= m <= last."""
+    import numpy as np
+    months = np.arange(np.datetime64(first, "M"), np.datetime64(last, "M") + 1)
+    ends = (months + 1).astype("datetime64[D]") - 1
+    return [str(d) for d in ends if str(first) <= str(d) <= str(last)]
+
+def _checkpoint_state(day) -> "pd.DataFrame":
+    """Task states stored in the checkpoint of `day` (None = nothing logged yet)."""
+    import pandas as pd
+    if day is None:
+        return pd.DataFrame(columns=_STATE_COLS)
+    return cached_df("SELECT task_id, xp, streak, last_done FROM xp_checkpoints WHERE date=?", (day,))
+
+def _events(after=None, until=None, inputs=False, task_ids=None) -> "pd.DataFrame":
+    """Logs (hot and archived) with after < date <= until, of `task_ids` (None = all tasks);
+    `inputs` adds each event's minutes, goal and difficulty."""
+    import numpy as np
+    import pandas as pd
+    where, params = [], []
+    if after is not None: where.append("l.date > ?"); params.append(after)
+    if until is not None: where.append("l.date <= ?"); params.append(until)
+    if task_ids is not None:
+        task_ids = [int(t) for t in task_ids]
+        where.append(f"l.task_id IN ({','.join('?' * len(task_ids))})"); params += task_ids
+    cols = "l.id, l.date, l.task_id, l.xp_gain"
+    join = ""
+    if inputs:   # logs written before these columns existed: goal from the ratio, difficulty as now
+        cols += (", l.minutes, COALESCE(l.goal_min, CASE WHEN l.ratio > 0 THEN CAST(ROUND(l.minutes / l.ratio) AS INTEGER)"
+                 " ELSE l.minutes END) AS goal, COALESCE(l.difficulty, t.difficulty, 2.0) AS difficulty")
+        join = " LEFT JOIN tasks t ON t.id = l.task_id"
+    hot = fetch_df(f"SELECT {cols} FROM logs l{join}" + (" WHERE " + " AND ".join(where) if where else ""), params)
+    if not archive.segments(after, until):
+        return hot
+    cold = archive.cold_logs(after, until)
+    if task_ids is not None:
+        cold = cold[cold["task_id"].isin(task_ids)].reset_index(drop=True)
+    if inputs:   # the same COALESCEs; SQL ROUND is half away from zero
+        goal = np.where(cold["ratio"] > 0, np.floor(cold["minutes"] / cold["ratio"].where(cold["ratio"] > 0, 1) + 0.5),
+                        cold["minutes"])
+        cold["goal"] = cold["goal_min"].fillna(pd.Series(goal, index=cold.index)).astype(np.int64)
+        current = cached_df("SELECT id AS task_id, difficulty FROM tasks").set_index("task_id")["difficulty"]
+        cold["difficulty"] = cold["difficulty"].fillna(cold["task_id"].map(current)).fillna(2.0)
+    return pd.concat([cold[hot.columns], hot], ignore_index=True)
+
+def _log_dates():
+    """(first, last) log date over hot and archived logs."""
+    # one aggregate per subquery, so each is a single idx_logs_date probe rather than a scan
+    lo, hi, cold_lo, cold_hi = get_conn().execute(
+        "SELECT (SELECT MIN(date) FROM logs), (SELECT MAX(date) FROM logs),"
+        " (SELECT MIN(first_date) FROM archive_segments), (SELECT MAX(last_date) FROM archive_segments)").fetchone()
+    return min(filter(None, (lo, cold_lo)), default=None), max(filter(None, (hi, cold_hi)), default=None)
+
+def _advance(start, events, boundaries=(), recompute=False, peaks=None):
+    """Replay `events` on top of `start` task states.
+
+    Returns (final state, [(boundary, state after that day), ...], per-event gains in
+    `events` order). Without `recompute` the stored xp_gain of every event is reused, and
+    only events whose xp_gain is NULL are scored (they need the `inputs` columns). A
+    `peaks` dict gets {task_id: {"xp": max xp, "streak": max streak}} over the replay.
+    """
+    import numpy as np
+    import pandas as pd
+    keys = ["task_id"]
+    start = start[_STATE_COLS].astype({"task_id": np.int64}).reset_index(drop=True)
+    if events.empty:
+        return start, [(b, start) for b in boundaries], np.empty(0, dtype=np.int64)
+    code = events.groupby(keys, sort=False).ngroup().to_numpy(np.int64)   # numbered by first appearance
+    groups = events[keys].drop_duplicates().reset_index(drop=True)
+    # start state per task group, and which start rows have no events at all
+    g0 = groups.merge(start, on=keys, how="left")
+    s_group = start.merge(groups.reset_index(), on=keys, how="left")["index"].fillna(-1).to_numpy(np.int64)
+    days = pd.to_datetime(events["date"], format="ISO8601").to_numpy().astype("datetime64[D]").astype(np.int64)
+    order = np.lexsort((events["id"].to_numpy(), days, code))
+    code, days = code[order], days[order]
+    last0 = pd.to_datetime(g0["last_done"], format="ISO8601").to_numpy().astype("datetime64[D]")[code]
+    stored = None if recompute else events["xp_gain"].fillna(-1).to_numpy(np.int64)[order]
+    scoring = stored is None or (stored < 0).any()
+    streak, gain, xp = _replay(
+        code, days,
+        events["minutes"].to_numpy(np.int64)[order] if scoring else None,
+        events["goal"].to_numpy(np.int64)[order] if scoring else None,
+        events["difficulty"].to_numpy(np.float64)[order] if scoring else None,
+        g0["xp"].fillna(0).to_numpy(np.int64)[code], g0["streak"].fillna(0).to_numpy(np.int64)[code], last0,
+        gain=stored)
+    gains = np.empty_like(gain); gains[order] = gain
+    first = np.ones(len(code), dtype=bool); first[1:] = code[1:] != code[:-1]
+    starts = np.flatnonzero(first)   # group g's events are starts[g]..; groups are 0..G-1 in code order
+    names = groups.to_numpy()[code[starts]]
+    if peaks is not None:
+        for t, px, ps in zip(names[:, 0].tolist(), np.maximum.reduceat(xp, starts).tolist(),
+                             np.maximum.reduceat(streak, starts).tolist()):
+            peaks[int(t)] = {"xp": px, "streak": ps}
+
+    def state_at(pos, valid):
+        rows = pd.DataFrame({"task_id": names[valid, 0], "xp": xp[pos[valid]],
+                             "streak": streak[pos[valid]],
+                             "last_done": np.datetime_as_string(days[pos[valid]].astype("datetime64[D]"), unit="D")})
+        # tasks with no event yet keep their start state
+        keep = s_group < 0
+        keep[s_group >= 0] = ~valid[s_group[s_group >= 0]]
+        return pd.concat([rows, start[keep]], ignore_index=True)
+
+    # each task's last event on or before a day: one searchsorted over the (code, day) order
+    dmin = int(days.min()); span = int(days.max()) - dmin + 2
+    combined = code * span + (days - dmin)
+    snaps = []
+    for b in boundaries:
+        off = min(max(int(np.datetime64(b, "D").astype(np.int64)) - dmin, -1), span - 2)
+        pos = np.searchsorted(combined, code[starts] * span + off, side="right") - 1
+        snaps.append((b, state_at(pos, pos >= starts)))
+    ends = np.append(starts[1:], len(code)) - 1
+    return state_at(ends, np.ones(len(ends), dtype=bool)), snaps, gains
+
+def _store_checkpoints(snaps):
+    rows = [(b, *r) for b, state in snaps for r in state[_STATE_COLS].itertuples(index=False, name=None)]
+    get_conn().executemany("INSERT OR REPLACE INTO xp_checkpoints(date,task_id,xp,streak,last_done) "
+                           "VALUES(?,?,?,?,?)", rows)
+
+def _prev_month_end(day) -> str:
+    day = dt.date.fromisoformat(day) if isinstance(day, str) else day
+    return (day.replace(day=1) - dt.timedelta(days=1)).isoformat()
+
+def build_checkpoints(until=None, events=None) -> int:
+    """Add the missing month-end checkpoints up to `until`.
+
+    The default stops at the month before both today and the newest log, so replaying
+    history in date order adds one checkpoint per month instead of rebuilding on every
+    log. Replays only the logs after the newest existing checkpoint (`events`, when the
+    caller already holds them as _events() would return them); returns how many were added.
+    """
+    conn = get_conn()
+    latest = conn.execute("SELECT MAX(date) FROM xp_checkpoints").fetchone()[0]
+    oldest, newest = _log_dates()
+    if until is None:
+        if newest is None:
+            return 0
+        until = min(_prev_month_end(dt.date.today()), _prev_month_end(newest))
+    until = str(until)
+    if latest is not None and latest >= until:
+        return 0
+    if latest is None:
+        first = oldest
+        if first is None or first > until:
+            return 0
+    else:
+        first = (dt.date.fromisoformat(latest) + dt.timedelta(days=1)).isoformat()
+    bounds = _month_ends(first, until)
+    if not bounds:
+        return 0
+    with transaction():
+        events = _events(latest, bounds[-1]) if events is None else events[events["date"] <= bounds[-1]]
+        _, snaps, _ = _advance(_checkpoint_state(latest), events, bounds)
+        _store_checkpoints(snaps)
+    return len(bounds)
+
+def _checkpoints_after_write(day, events=None):
+    """Drop checkpoints a log dated `day` invalidates, then top them up (see build_checkpoints)."""
+    execute("DELETE FROM xp_checkpoints WHERE date >= ?", (day,))
+    build_checkpoints(events=events)
+
+def _rescore(task_ids, since, peaks=None) -> dict:
+    """Merge backdated logs into these tasks' timelines.
+
+    Replays the tasks' logs from the last checkpoint before `since` (the oldest new log's
+    date). Logs whose xp_gain is NULL, and every log dated `since` or later, are scored
+    against the streak on their day, so the stored gains match what recompute_state()
+    would give. Writes the gains (changed ones also in archived months and daily_rollup)
+    and the tasks' xp/streak/last_done, and returns {log id: gain} of the NULL ones;
+    their rollups and dropping the checkpoints from `since` on are left to the caller.
+    """
+    import numpy as np
+    cp = get_conn().execute("SELECT MAX(date) FROM xp_checkpoints WHERE date < ?", (since,)).fetchone()[0]
+    start = _checkpoint_state(cp)
+    start = start[start["task_id"].isin(task_ids)]
+    events = _events(cp, inputs=True, task_ids=task_ids)
+    new = events["xp_gain"].isna().to_numpy()
+    stored = events["xp_gain"].to_numpy(np.float64)
+    events["xp_gain"] = events["xp_gain"].where(events["date"] < since)   # NULL: scored by the replay
+    final, _, gains = _advance(start, events, peaks=peaks)
+    ids = events["id"].to_numpy(np.int64)
+    changed = ~new & (gains != stored)
+    conn = get_conn()
+    conn.executemany("UPDATE logs SET xp_gain=? WHERE id=?", zip(gains[new | changed].tolist(), ids[new | changed].tolist()))
+    if changed.any():
+        archive.update_gains(ids[changed], gains[changed])
+        domain_of = dict(conn.execute(f"SELECT id, domain_id FROM tasks WHERE id IN ({','.join('?' * len(task_ids))})",
+                                      [int(t) for t in task_ids]))
+        delta = gains[changed] - stored[changed].astype(np.int64)
+        rollup_add((d, t, domain_of[t], 0, g, 0, 0.0) for d, t, g in
+                   zip(events["date"][changed].tolist(), events["task_id"][changed].tolist(), delta.tolist()))
+    conn.executemany("UPDATE tasks SET xp=?, streak=?, last_done=? WHERE id=?",
+                     ((int(x), int(st), d, int(t)) for t, x, st, d in final[_STATE_COLS].itertuples(index=False)))
+    return dict(zip(ids[new].tolist(), gains[new].tolist()))
+
+def state_as_of(day) -> "pd.DataFrame":
+    """Every task's xp, streak, last_done and level after all logs dated on or before `day`.
+
+    Costs one checkpoint read plus a replay of the logs since that checkpoint.
+    """
+    day = (dt.date.fromisoformat(day) if isinstance(day, str) else day).isoformat()
+    cp = fetch_rows("SELECT MAX(date) FROM xp_checkpoints WHERE date <= ?", (day,))[0][0]
+    state, _, _ = _advance(_checkpoint_state(cp), _events(cp, day))
+    out = (cached_df("SELECT id AS task_id, domain, task FROM tasks ORDER BY domain, task")
+           .merge(state, on="task_id", how="left").drop(columns="task_id"))
+    out["xp"] = out["xp"].fillna(0).astype(int)
+    out["streak"] = out["streak"].fillna(0).astype(int)
+    out["Level"] = out["xp"].apply(get_level)
+    return out
+
+def recompute_state() -> dict:
+    """Rebuild everything derived from `logs` with the current scoring rules.
+
+    Every log's (archived ones included) xp_gain is recomputed from its minutes, goal and difficulty, then tasks'
+    xp/streak/last_done, daily rollups and all checkpoints are rebuilt from the replay, and
+    prerequisites are re-checked. Goals, difficulty and manual locks are left alone.
+    """
+    import numpy as np
+    import pandas as pd
+    events = _events(inputs=True)
+    bounds = []
+    if not events.empty:
+        bounds = _month_ends(events["date"].min(), min(_prev_month_end(dt.date.today()),
+                                                       _prev_month_end(events["date"].max())))
+    final, snaps, gains = _advance(pd.DataFrame(columns=_STATE_COLS), events, bounds, recompute=True)
+    changed = np.flatnonzero(gains != events["xp_gain"].to_numpy(np.int64)) if len(events) else np.empty(0, int)
+    with transaction() as conn:
+        conn.executemany("UPDATE logs SET xp_gain=? WHERE id=?",
+                         zip(gains[changed].tolist(), events["id"].to_numpy()[changed].tolist()))
+        archive.update_gains(events["id"].to_numpy()[changed], gains[changed])
+        execute("UPDATE tasks SET xp=0, streak=0, last_done=NULL")
+        conn.executemany("UPDATE tasks SET xp=?, streak=?, last_done=? WHERE id=?",
+                         ((int(x), int(s), d, int(t)) for t, x, s, d in final[_STATE_COLS].itertuples(index=False)))
+        rebuild_rollup()
+        execute("DELETE FROM xp_checkpoints")
+        _store_checkpoints(snaps)
+        unlocked = maybe_unlock_all()
+    return {"events": len(events), "tasks": len(final), "gains_changed": len(changed),
+            "checkpoints": len(snaps), "unlocked": unlocked}
+
+# ---------- recommender ----------
+def recommend(k=3, weights=None, scoring=None, today=None) -> "pd.DataFrame":
+    """Rank tasks to work on next; returns the top `k` rows with per-term score breakdowns.
+
+    `scoring` overrides entries of RECOMMENDER; `weights` defaults to the stored domain weights.
+    """
+    import numpy as np
+    import pandas as pd
+    cfg = {**RECOMMENDER, **(scoring or {})}
+    weights = get_domain_weights() if weights is None else weights
+    df = cached_df("SELECT domain, task, xp, streak, last_done, goal_min FROM tasks")
+    if df.empty:
+        return df
+    today = np.datetime64(today or dt.date.today(), "D")
+    last = pd.to_datetime(df["last_done"], format="%Y-%m-%d", errors="coerce").to_numpy().astype("datetime64[D]")
+    idle = np.where(np.isnat(last), cfg["never_idle"], (today - last).astype(np.int64))
+    xp = df["xp"].to_numpy(np.float64); streak = df["streak"].to_numpy(np.float64)
+    w = df["domain"].map(weights).fillna(cfg["default_weight"]).to_numpy(np.float64)
+
+    df["xp_term"] = cfg["xp"] / (1 + xp)
+    df["streak_term"] = cfg["streak"] / (1 + streak)
+    df["idle_term"] = cfg["idle"] * np.minimum(cfg["idle_cap"], idle / cfg["idle_days"])
+    df["weight_factor"] = 1 + (cfg["weight_pivot"] - w)
+    score = (df["xp_term"].to_numpy() + df["streak_term"].to_numpy() + df["idle_term"].to_numpy()) * df["weight_factor"].to_numpy()
+    df["score"] = score
+    k = min(k, len(df))
+    top = np.argpartition(-score, k - 1)[:k] if k < len(df) else np.arange(len(df))
+    top = top[np.argsort(-score[top], kind="stable")]
+    return df.iloc[top].reset_index(drop=True)
+
+# ---------- read models (dashboard / tables) ----------
+def domain_summary():
+    return cached_df("SELECT domain, SUM(xp) AS xp, AVG(streak) AS avg_streak FROM tasks GROUP BY domain ORDER BY xp DESC")
+
+def xp_by_day(days=30):
+    """Daily XP per domain from daily_rollup for the last `days` days (None = all history)."""
+    # CROSS JOIN and `+domain_id` keep the planner on the rollup's (date, ...) key for the range
+    sql = ("SELECT r.date, d.name AS domain, SUM(r.xp) AS xp FROM daily_rollup r CROSS JOIN domains d ON d.id = r.domain_id"
+           "{} GROUP BY r.date, +r.domain_id ORDER BY r.date")
+    if days is None:
+        return cached_df(sql.format(""))
+    return cached_df(sql.format(" WHERE r.date >= ?"), ((dt.date.today()-dt.timedelta(days=days)).isoformat(),))
+
+# (name, days per bucket, bucket start date from a rollup date)
+_BUCKETS = (("day", 1, "r.date"),
+            ("week", 7, "date(r.date, '-6 days', 'weekday 1')"),   # Monday
+            ("month", 31, "substr(r.date, 1, 7) || '-01'"),
+            ("year", 366, "substr(r.date, 1, 4) || '-01-01'"))
+
+def trend(metric="xp", days=None, points=TREND_POINTS):
+    """Per-domain XP or minutes over the last `days` days (None = all history).
+
+    Days are summed into the finest bucket (day, week, month, year) that keeps every
+    domain's series within `points` points, so the result stays small on any history.
+    Returns (DataFrame[date, domain, metric], bucket name); `date` is the bucket's first day.
+    """
+    if metric not in ("xp", "minutes"):
+        raise ValueError(f"Unknown trend metric {metric!r}")
+    today = dt.date.today()
+    if days is None:
+        first = cached_rows("SELECT MIN(date) FROM daily_rollup")[0][0]
+        span = (today - dt.date.fromisoformat(first)).days + 1 if first else 1
+        where, params = "", ()
+    else:
+        span = days + 1
+        where, params = " WHERE r.date >= ?", ((today - dt.timedelta(days=days)).isoformat(),)
+    name, expr = next(((n, e) for n, w, e in _BUCKETS if span // w + 1 <= points), _BUCKETS[-1][::2])
+    # CROSS JOIN and `+domain_id` as in xp_by_day
+    df = cached_df(f"SELECT {expr} AS date, d.name AS domain, SUM(r.{metric}) AS {metric}"
+                   f" FROM daily_rollup r CROSS JOIN domains d ON d.id = r.domain_id{where}"
+                   f" GROUP BY 1, +r.domain_id ORDER BY 1", params)
+    return df, name
+
+def history_page(before_id=None, page_size=50, domain=None, task=None, date_from=None, date_to=None):
+    """One page of logs, newest first, strictly older than `before_id` (keyset on id).
+
+    Returns (page, next_before_id); next_before_id is None on the last page.
+    """
+    where, params = [], []
+    domain_id = ids = None
+    if before_id is not None: where.append("l.id < ?"); params.append(int(before_id))
+    if domain:
+        domain_id = (cached_rows("SELECT id FROM domains WHERE name_key = ?", (name_key(domain),)) or [(-1,)])[0][0]
+        where.append("l.domain_id = ?"); params.append(domain_id)
+    if task:   # ids resolved first: one task keeps the newest-first walk of idx_logs_task_id
+        ids = [i for (i,) in cached_rows("SELECT id FROM tasks WHERE task_key = ?", (name_key(task),))] or [None]
+        where.append(f"l.task_id IN ({','.join('?' * len(ids))})"); params += ids
+    if date_from: where.append("l.date >= ?"); params.append(str(date_from))
+    if date_to: where.append("l.date <= ?"); params.append(str(date_to))
+    sql = ("SELECT l.id, l.ts, l.date, t.domain, t.task, l.minutes, l.xp_gain, l.ratio, l.note"
+           " FROM logs l CROSS JOIN tasks t ON t.id = l.task_id"   # CROSS: logs stays the outer loop
+           + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY l.id DESC LIMIT ?")
+    df = cached_df(sql, tuple(params) + (int(page_size) + 1,))
+    if archive.segments():
+        # archived rows only matter where they beat the hot page's oldest id
+        import pandas as pd
+        cold = archive.newest(int(page_size) + 1, before_id, domain_id, ids and [i for i in ids if i is not None],
+                              date_from or None, date_to or None,
+                              above_id=int(df["id"].iloc[-1]) if len(df) > page_size else None)
+        if not cold.empty:
+            names = cached_df("SELECT id AS task_id, domain, task FROM tasks")
+            cold = cold.merge(names, on="task_id")[df.columns]
+            df = (pd.concat([df, cold], ignore_index=True).sort_values("id", ascending=False)
+                  .head(int(page_size) + 1).reset_index(drop=True))
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        return df, int(df["id"].iloc[-1])
+    return df, None
+
+def tasks_table():
+    df = cached_df("SELECT domain, task, xp, streak, last_done, goal_min, difficulty, locked FROM tasks ORDER BY domain, task")
+    df["Level"] = df["xp"].apply(get_level)
+    df["Status"] = df["locked"].map({0:"Unlocked",1:"Locked"})
+    return df
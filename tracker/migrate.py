@@ -0,0 +1,125 @@
+"""Migration of pre-id databases, where every log row repeated its domain and task names.
+
+Runs from db_init() on first use of such a file, before anything else reads it:
+
+1. domains rows and tasks.domain_id / task_key are filled in, and the original
+   (domain, task) names are mapped to ids in `migrate_names` (one short transaction);
+2. logs are copied into `logs_v2`, keyed by task_id/domain_id, in id order, MIGRATE_CHUNK
+   rows per transaction. The copy cursor is committed with each chunk, so an interrupted
+   migration resumes where it stopped, and other connections get the lock between chunks;
+3. the last chunk swaps the tables and drops the name-keyed derived tables, which
+   db_init() recreates and rebuilds from the new logs (month-end checkpoints are rebuilt
+   by the next write, or `python -m tracker migrate`).
+
+Progress is reported on the `tracker.migrate` logger.
+"""
+import logging
+
+from . import config
+from .db import ensure_domain, get_conn, name_key, transaction
+
+log = logging.getLogger(__name__)
+
+_CURSOR = "migrate:logs"
+_DERIVED = ("daily_rollup", "learn_window", "xp_checkpoints")
+
+def _columns(conn, table) -> set:
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+def pending() -> bool:
+    """True while the database still has name-keyed logs or tasks without keys."""
+    conn = get_conn()
+    return "domain" in _columns(conn, "logs") or \
+        conn.execute("SELECT 1 FROM tasks WHERE task_key IS NULL LIMIT 1").fetchone() is not None
+
+def _map_names(conn, named_logs):
+    """Step 1: keys for every task, and migrate_names (original names → ids) for the copy."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS migrate_names(
+                      domain TEXT, task TEXT, task_id INTEGER, domain_id INTEGER, PRIMARY KEY(domain, task))""")
+    if named_logs:   # logs naming a task that no longer exists get the task back
+        orphans = conn.execute("""SELECT DISTINCT domain, task FROM logs l WHERE domain IS NOT NULL AND task IS NOT NULL
+                                  AND NOT EXISTS (SELECT 1 FROM tasks t WHERE t.domain = l.domain AND t.task = l.task)
+                               """).fetchall()
+        conn.executemany("INSERT INTO tasks(domain,task,goal_min,difficulty,locked) VALUES(?,?,20,2.0,0)", orphans)
+        if orphans:
+            log.info("recreated %d tasks that only appear in logs (`recompute` replays their XP)", len(orphans))
+    taken = set(conn.execute("SELECT domain_id, task_key FROM tasks WHERE task_key IS NOT NULL").fetchall())
+    for tid, domain, task in conn.execute("SELECT id, domain, task FROM tasks WHERE task_key IS NULL ORDER BY id").fetchall():
+        domain_id = ensure_domain(domain or "")
+        conn.execute("INSERT OR IGNORE INTO migrate_names VALUES(?,?,?,?)", (domain, task, tid, domain_id))
+        name = task or ""
+        if (domain_id, name_key(name)) in taken:   # names that differed only in case (or not at all)
+            name = f"{name} ({tid})"
+            log.info("task %r in %r renamed to %r: the name is taken", task, domain, name)
+        taken.add((domain_id, name_key(name)))
+        conn.execute("UPDATE tasks SET domain=(SELECT name FROM domains WHERE id=?), domain_id=?, task=?, task_key=? "
+                     "WHERE id=?", (domain_id, domain_id, name, name_key(name), tid))
+
+def _copy_chunk(conn, chunk) -> int:
+    """Step 2: copy the next `chunk` logs; returns how many source rows were consumed."""
+    row = conn.execute("SELECT value FROM meta WHERE key=?", (_CURSOR,)).fetchone()
+    after = int(row[0]) if row else 0
+    ids = conn.execute("SELECT MIN(id), MAX(id), COUNT(*) FROM (SELECT id FROM logs WHERE id > ? ORDER BY id LIMIT ?)",
+                       (after, chunk)).fetchone()
+    if not ids[2]:
+        return 0
+    cols = _columns(conn, "logs")
+    goal = "l.goal_min" if "goal_min" in cols else "NULL"
+    diff = "l.difficulty" if "difficulty" in cols else "NULL"
+    conn.execute(f"""INSERT INTO logs_v2(id,ts,date,task_id,domain_id,minutes,xp_gain,ratio,note,goal_min,difficulty)
+                     SELECT l.id, l.ts, l.date, m.task_id, m.domain_id, l.minutes, l.xp_gain, l.ratio, l.note, {goal}, {diff}
+                     FROM logs l JOIN migrate_names m ON m.domain = l.domain AND m.task = l.task
+                     WHERE l.id BETWEEN ? AND ?""", ids[:2])
+    conn.execute("INSERT OR REPLACE INTO meta(key,value) VALUES(?,?)", (_CURSOR, ids[1]))
+    return ids[2]
+
+def _swap(conn):
+    """Step 3: logs_v2 becomes logs; name-keyed derived tables go (db_init rebuilds them)."""
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='logs'").fetchone()
+    conn.execute("DROP TABLE logs")
+    conn.execute("ALTER TABLE logs_v2 RENAME TO logs")
+    if seq is not None:   # ids of deleted newest logs are still never reused
+        conn.execute("UPDATE sqlite_sequence SET seq=MAX(seq, ?) WHERE name='logs'", (seq[0],))
+    for table in _DERIVED:
+        if "task_id" not in _columns(conn, table):
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.execute("DROP TABLE migrate_names")
+    conn.execute("DELETE FROM meta WHERE key IN (?, 'rollup:built')", (_CURSOR,))
+
+def migrate_schema(chunk=None) -> int:
+    """Bring a pre-id database to the integer-key schema; returns the number of logs copied."""
+    if not pending():
+        return 0
+    chunk = int(chunk or config.MIGRATE_CHUNK)
+    conn = get_conn()
+    named_logs = "domain" in _columns(conn, "logs")
+    if not _columns(conn, "migrate_names"):   # present = step 1 done, resuming the copy
+        with transaction():
+            _map_names(conn, named_logs)
+    if not named_logs:
+        with transaction():
+            conn.execute("DROP TABLE IF EXISTS migrate_names")
+        return 0
+    conn.execute("""CREATE TABLE IF NOT EXISTS logs_v2(
+                      id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      ts TIMESTAMP, date DATE,
+                      task_id INTEGER REFERENCES tasks(id),
+                      domain_id INTEGER REFERENCES domains(id),
+                      minutes INTEGER, xp_gain INTEGER, ratio REAL,
+                      note TEXT,
+                      goal_min INTEGER, difficulty REAL
+                    )""")
+    row = conn.execute("SELECT value FROM meta WHERE key=?", (_CURSOR,)).fetchone()
+    total = conn.execute("SELECT COUNT(*) FROM logs WHERE id > ?", (int(row[0]) if row else 0,)).fetchone()[0]
+    copied = 0
+    while True:
+        with transaction():
+            n = _copy_chunk(conn, chunk)
+            if not n:
+                _swap(conn)
+        if not n:
+            break
+        copied += n
+        log.info("logs: %d rows copied (%d to go)", copied, max(total - copied, 0))
+    log.info("migrated %d logs to integer keys", copied)
+    return copied
@@ -0,0 +1,166 @@
+"""Per-database writer queues with group commit.
+
+Concurrent sessions hand their writes to a background thread instead of each committing
+on its own connection. Every user database has its own queue and thread, so one user's
+bulk import never holds up another user's writes. The thread drains its queue for a short
+window, applies the jobs inside a single transaction (each job in its own savepoint, so a
+failing job only undoes itself) and commits once. Callers get a
+`concurrent.futures.Future` that resolves after the commit. Reads keep using the
+per-session WAL connections and never wait on a writer. A thread exits after IDLE_EXIT
+seconds without work and is restarted by the next submit.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import NamedTuple
+
+from .db import as_user, current_user, normalize_user, transaction
+from .engine import log_progress, set_domain_weight, set_goal
+
+GROUP_WINDOW = 0.005   # seconds to keep collecting jobs after the first one arrives
+MAX_GROUP = 512        # jobs per group commit
+IDLE_EXIT = 30.0       # seconds an idle writer thread lingers
+
+class _Job(NamedTuple):
+    fn: object
+    args: tuple
+    kwargs: dict
+    future: Future
+
+class WriteQueue:
+    """The writer of one user's database."""
+
+    def __init__(self, user, window=GROUP_WINDOW, max_group=MAX_GROUP, idle_exit=IDLE_EXIT):
+        self.user = user
+        self.window = window
+        self.max_group = max_group
+        self.idle_exit = idle_exit
+        self.commits = self.jobs = 0
+        self._q = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Queue `fn(*args, **kwargs)` to run on this database's writer thread."""
+        fut = Future()
+        with self._lock:   # an idle thread only exits under the lock with the queue empty
+            self._q.put(_Job(fn, args, kwargs, fut))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"tracker-writer-{self.user}", daemon=True)
+                self._thread.start()
+        return fut
+
+    def close(self, timeout=None):
+        """Apply everything already queued, then stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._q.put(None)
+        thread.join(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                first = self._q.get(timeout=self.idle_exit)
+            except queue.Empty:
+                with self._lock:
+                    if self._q.empty():
+                        self._thread = None
+                        return
+                continue
+            if first is None:
+                return
+            group, stop = [first], False
+            deadline = time.monotonic() + self.window
+            while len(group) < self.max_group:
+                try:
+                    job = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                group.append(job)
+            self._commit(group)
+            if stop:
+                return
+
+    def _commit(self, jobs):
+        outcomes = []
+        try:
+            with as_user(self.user), transaction():
+                for job in jobs:
+                    if not job.future.set_running_or_notify_cancel():
+                        outcomes.append(None)
+                        continue
+                    try:
+                        with transaction():
+                            outcomes.append((True, job.fn(*job.args, **job.kwargs)))
+                    except Exception as e:
+                        outcomes.append((False, e))
+        except Exception as e:   # BEGIN, a job's savepoint or the commit failed: nothing was written
+            for job in jobs:
+                if job.future.done():
+                    continue
+                if job.future.running() or job.future.set_running_or_notify_cancel():
+                    job.future.set_exception(e)
+            return
+        self.commits += 1
+        self.jobs += len(jobs)
+        for job, out in zip(jobs, outcomes):
+            if out is None:
+                continue
+            ok, value = out
+            if ok:
+                job.future.set_result(value)
+            else:
+                job.future.set_exception(value)
+
+class Writers:
+    """One WriteQueue per user database, created on first use."""
+
+    def __init__(self, **options):
+        self.options = options
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def queue(self, user=None) -> WriteQueue:
+        uid = normalize_user(user if user is not None else current_user())
+        with self._lock:
+            if uid not in self._queues:
+                self._queues[uid] = WriteQueue(uid, **self.options)
+            return self._queues[uid]
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Queue `fn(*args, **kwargs)` on the current user's writer."""
+        return self.queue().submit(fn, *args, **kwargs)
+
+    def close(self, timeout=None):
+        with self._lock:
+            queues = list(self._queues.values())
+        for q in queues:
+            q.close(timeout)
+
+    @property
+    def commits(self) -> int:
+        return sum(q.commits for q in list(self._queues.values()))
+
+    @property
+    def jobs(self) -> int:
+        return sum(q.jobs for q in list(self._queues.values()))
+
+WRITER = Writers()
+
+def submit(fn, *args, **kwargs) -> Future:
+    return WRITER.submit(fn, *args, **kwargs)
+
+def submit_log(domain, task, minutes, note="", day=None) -> Future:
+    return WRITER.submit(log_progress, domain, task, minutes, note, day)
+
+def submit_goal(task, minutes) -> Future:
+    return WRITER.submit(set_goal, task, minutes)
+
+def submit_weight(domain, value) -> Future:
+    return WRITER.submit(set_domain_weight, domain, value)